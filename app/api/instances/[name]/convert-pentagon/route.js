@@ -3,7 +3,9 @@ import fs from 'fs';
 import path from 'path';
 import {
   checkDatasetFormat,
-  convertDatasetToPentagonFormat
+  convertDatasetToPentagonFormat,
+  resolveImagePath,
+  triggerBatchLabelSync
 } from '@/lib/manager';
 import { getInstanceByName, updateInstanceFields } from '@/lib/db';
 import { withApiLogging } from '@/lib/api-logger';
@@ -43,10 +45,18 @@ export const POST = withApiLogging(async (req, { params }) => {
       );
     }
 
-    const result = await convertDatasetToPentagonFormat(datasetPath);
+    const { convertedFiles, ...result } = await convertDatasetToPentagonFormat(datasetPath);
 
     await updateInstanceFields(name, { pentagonFormat: true });
 
+    // Bring the running instance in line with the rewritten label files
+    if (instance.autoSync) {
+      const pairs = convertedFiles
+        .map((labelPath) => ({ imagePath: resolveImagePath(instance, '', labelPath), labelPath }))
+        .filter(({ imagePath }) => imagePath);
+      triggerBatchLabelSync(instance, pairs);
+    }
+
     return NextResponse.json({
       message: 'Dataset converted to OBB format successfully',
       ...result,
@@ -0,0 +1,30 @@
+import { NextResponse } from 'next/server';
+import fs from 'fs';
+import path from 'path';
+import { getInstanceByName } from '@/lib/db';
+import { withApiLogging } from '@/lib/api-logger';
+
+export const dynamic = 'force-dynamic';
+
+export const GET = withApiLogging(async (req, { params }) => {
+  try {
+    const { name } = params;
+    const instance = await getInstanceByName(name);
+
+    if (!instance) {
+      return NextResponse.json({ error: 'Instance not found' }, { status: 404 });
+    }
+
+    // Written by start_fiftyone.py while the instance starts up
+    const progressPath = path.join(path.resolve(instance.datasetPath), 'startup_progress.json');
+
+    if (!fs.existsSync(progressPath)) {
+      return NextResponse.json({ status: 'unknown' });
+    }
+
+    const progress = JSON.parse(fs.readFileSync(progressPath, 'utf-8'));
+    return NextResponse.json(progress);
+  } catch (err) {
+    return NextResponse.json({ error: err.message }, { status: 500 });
+  }
+});
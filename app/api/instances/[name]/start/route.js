@@ -35,6 +35,61 @@ export const POST = withApiLogging(async (req, { params }) => {
       args.push('--class-file', instance.classFile);
     }
 
+    // Worker processes for label parsing, duplicate search and image hashing
+    const workers = parseInt(process.env.INGEST_WORKERS, 10);
+    if (Number.isInteger(workers) && workers > 0) {
+      args.push('--workers', String(workers));
+    }
+
+    // Samples inserted per batch during ingest
+    const ingestBatchSize = parseInt(process.env.INGEST_BATCH_SIZE, 10);
+    if (Number.isInteger(ingestBatchSize) && ingestBatchSize > 0) {
+      args.push('--ingest-batch-size', String(ingestBatchSize));
+    }
+
+    // Insert sample documents directly with pymongo on the initial ingest
+    if (process.env.INGEST_BULK_INSERT === 'true') {
+      args.push('--bulk-insert');
+    }
+
+    // Find duplicates across the whole dataset instead of adjacent files only
+    if (process.env.DUPLICATE_SEARCH === 'global') {
+      args.push('--duplicate-search', 'global');
+    }
+
+    // Only compare images added since the last start for duplicates
+    if (process.env.DUPLICATE_INCREMENTAL === 'true') {
+      args.push('--incremental-duplicates');
+    }
+
+    // Also compare perceptual image hashes (dhash | phash) during duplicate detection
+    const imageHash = process.env.DUPLICATE_IMAGE_HASH;
+    if (imageHash === 'dhash' || imageHash === 'phash') {
+      args.push('--image-hash', imageHash);
+      if (process.env.DUPLICATE_HASH_RULE === 'or') {
+        args.push('--hash-rule', 'or');
+      }
+      const hashDistance = parseInt(process.env.DUPLICATE_HASH_DISTANCE, 10);
+      if (Number.isInteger(hashDistance) && hashDistance >= 0) {
+        args.push('--hash-distance', String(hashDistance));
+      }
+    }
+
+    // Launch the App first and ingest in the background
+    if (process.env.PROGRESSIVE_STARTUP === 'true') {
+      args.push('--progressive');
+    }
+
+    // Apply changes made on disk by other tools while the instance runs
+    if (process.env.WATCH_DATASET_CHANGES === 'true') {
+      args.push('--watch');
+    }
+
+    // Keep the dataset in MongoDB between starts and only apply what changed on disk
+    if (process.env.PERSISTENT_DATASETS === 'true') {
+      args.push('--persistent');
+    }
+
     const command = `/opt/venv/bin/python ${scriptPath} ${args.join(' ')}`;
 
     const datasetName = path.basename(instance.datasetPath);
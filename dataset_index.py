@@ -0,0 +1,59 @@
+"""
+In-memory index of a dataset's images/ and labels/ folders.
+
+Each folder is listed once with os.scandir; startup phases (orphan cleanup,
+duplicate handling, ingest) then query and update the index instead of
+listing the folders again or stat-ing individual files.
+"""
+
+import os
+from typing import List, Set
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def _scan_filenames(directory: str) -> Set[str]:
+    if not os.path.isdir(directory):
+        return set()
+    with os.scandir(directory) as entries:
+        return {entry.name for entry in entries}
+
+
+class DatasetIndex:
+    """
+    Filenames present in <dataset>/images and <dataset>/labels.
+    Callers that move or delete files must report it with discard_image /
+    discard_label so the index stays in line with the disk.
+    """
+
+    def __init__(self, dataset_base: str):
+        self.dataset_base = dataset_base
+        self.img_dir = os.path.join(dataset_base, "images")
+        self.label_dir = os.path.join(dataset_base, "labels")
+        self.rescan()
+
+    def rescan(self) -> None:
+        self.images = {
+            name for name in _scan_filenames(self.img_dir)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        }
+        self.labels = _scan_filenames(self.label_dir)
+
+    def image_filenames(self) -> List[str]:
+        """Image filenames sorted by name (filename order = time order)."""
+        return sorted(self.images)
+
+    def has_image_for_stem(self, stem: str) -> bool:
+        return any(stem + ext in self.images for ext in IMAGE_EXTENSIONS)
+
+    def has_label(self, stem: str) -> bool:
+        return stem + ".txt" in self.labels
+
+    def label_path(self, stem: str) -> str:
+        return os.path.join(self.label_dir, stem + ".txt")
+
+    def discard_image(self, filename: str) -> None:
+        self.images.discard(filename)
+
+    def discard_label(self, filename: str) -> None:
+        self.labels.discard(filename)
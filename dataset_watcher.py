@@ -0,0 +1,179 @@
+"""
+Watch a dataset's images/ and labels/ folders for file changes.
+
+Uses inotify through ctypes on Linux and falls back to comparing directory
+listings on an interval when inotify is unavailable (other platforms, some
+network mounts, exhausted watch limits). Changes are reported in batches of
+(folder, filename) pairs once the folders have been quiet for a settle window,
+or after at most a maximum batch age while writes keep coming.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from typing import Dict, Iterator, Optional, Sequence, Set, Tuple
+
+# (watched folder, filename)
+FileChange = Tuple[str, str]
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF
+)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Longest a batch collects changes while events keep arriving
+DEFAULT_MAX_BATCH_SECONDS = 10.0
+
+
+class InotifyWatcher:
+    """
+    inotify watches on a set of folders. poll() returns the changed files,
+    and a flag telling the caller to rescan because events were lost.
+    """
+
+    def __init__(self, directories: Sequence[str]):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._dirs: Dict[int, str] = {}
+        try:
+            for directory in directories:
+                wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+                self._dirs[wd] = directory
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def poll(self, timeout: float) -> Tuple[Set[FileChange], bool]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set(), False
+
+        data = os.read(self._fd, 64 * 1024)
+        changes = set()
+        overflow = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF):
+                overflow = True
+            elif name and not mask & IN_ISDIR and wd in self._dirs:
+                changes.add((self._dirs[wd], os.fsdecode(name)))
+        return changes, overflow
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def _snapshot(directory: str) -> Dict[str, Tuple[int, int]]:
+    snapshot = {}
+    if not os.path.isdir(directory):
+        return snapshot
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class PollingWatcher:
+    """Fallback watcher that diffs (size, mtime) listings every interval seconds."""
+
+    def __init__(self, directories: Sequence[str], interval: float = 2.0):
+        self.interval = interval
+        self._snapshots = {directory: _snapshot(directory) for directory in directories}
+        self._next_scan = time.monotonic() + interval
+
+    def poll(self, timeout: float) -> Tuple[Set[FileChange], bool]:
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set(), False
+        time.sleep(max(0.0, wait))
+        self._next_scan = time.monotonic() + self.interval
+
+        changes = set()
+        for directory, before in self._snapshots.items():
+            after = _snapshot(directory)
+            for name in before.keys() | after.keys():
+                if before.get(name) != after.get(name):
+                    changes.add((directory, name))
+            self._snapshots[directory] = after
+        return changes, False
+
+    def close(self) -> None:
+        pass
+
+
+def open_watcher(directories: Sequence[str], poll_interval: float = 2.0):
+    """Return an inotify watcher, or a polling watcher if inotify is unavailable."""
+    try:
+        return InotifyWatcher(directories)
+    except (OSError, AttributeError) as e:
+        print(f"inotify unavailable ({e}); polling every {poll_interval}s instead")
+        return PollingWatcher(directories, poll_interval)
+
+
+def iter_change_batches(
+    watcher,
+    settle_seconds: float = 1.0,
+    stop_event: Optional[threading.Event] = None,
+    max_batch_seconds: float = DEFAULT_MAX_BATCH_SECONDS,
+) -> Iterator[Tuple[Set[FileChange], bool]]:
+    """
+    Yield (changes, rescan) batches. A batch is emitted once no new events
+    arrived for settle_seconds, so bursts such as an rsync or a conversion
+    script land as one batch, or once its first change is max_batch_seconds
+    old, so a steady stream of writes cannot hold changes back forever.
+    rescan is True when events may have been lost.
+    """
+    pending: Set[FileChange] = set()
+    rescan = False
+    batch_started = 0.0
+    while stop_event is None or not stop_event.is_set():
+        timeout = settle_seconds
+        if pending or rescan:
+            timeout = max(0.0, min(timeout, batch_started + max_batch_seconds - time.monotonic()))
+        changes, overflow = watcher.poll(timeout)
+        if changes or overflow:
+            if not pending and not rescan:
+                batch_started = time.monotonic()
+            pending |= changes
+            rescan = rescan or overflow
+            if time.monotonic() - batch_started < max_batch_seconds:
+                continue
+
+        if pending or rescan:
+            yield pending, rescan
+            pending = set()
+            rescan = False
@@ -1,8 +1,85 @@
 #!/usr/bin/env python3
+import argparse
+import bisect
+import contextlib
+import io
+import json
+import math
 import os
+import sys
+import time
+import traceback
 from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Optional, Sequence, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from dataset_index import DatasetIndex
+from image_hash import DEFAULT_MAX_DISTANCE, HASH_KINDS, HASH_RULES, ImageHashRule, hashing_available
+from label_cache import LabelCache, get_label_rows, open_label_cache
+from label_geometry import (
+    box_iou_matrix,
+    iou_upper_bound,
+    polygon_area,
+    quad_iou,
+    quad_iou_matrix,
+    row_to_quad,
+    rows_to_quads,
+)
+
+# (class_id, x_center, y_center, width, height), or
+# (class_id, x1, y1, x2, y2, x3, y3, x4, y4) for OBB lines
+YoloLabel = Tuple[float, ...]
+
+SIMILARITY_ENGINES = ("auto", "numpy", "python")
+
+# Below this many boxes per image the pure-Python comparison is faster than
+# setting up NumPy arrays ("auto" engine)
+NUMPY_MIN_BOXES = 12
+
+# OBB label sets up to this size are compared pair by pair without NumPy,
+# which is faster than building the batched clipping arrays
+OBB_SCALAR_MAX_LABELS = 16
+
+# "sequential" compares each image with the run of images right after it,
+# "global" compares images anywhere in the dataset that share a label signature
+DUPLICATE_SEARCH_MODES = ("sequential", "global")
+
+# Grid cell (normalized units) for bucketing mean box centres and sizes in
+# the global search. It only affects speed: the cells probed around an image
+# cover every mean centre and size a match can have (see search_reach).
+SIGNATURE_CELL_SIZE = 0.02
+
+# An image probing more cells than this scans every bucket of its class
+# multiset instead (low thresholds, very large boxes)
+MAX_PROBED_CELLS = 512
+
+# OBB labels reuse the box bound on each quad's axis-aligned extent, widened
+# by this factor; unlike the box bound it is a safety margin, not a proof
+OBB_REACH_MARGIN = 2.0
+
+# Smallest slice of the sorted file list handed to one worker in the
+# parallel sequential search
+PARALLEL_MIN_CHUNK = 2000
+
+# Label files parsed ahead of the sequential scan cursor, and the threads
+# reading them (reads mostly wait on disk or NFS, so threads overlap them)
+PREFETCH_WINDOW = 64
+PREFETCH_THREADS = 8
+
+# Threads renaming or deleting files in process_duplicates
+MOVE_THREADS = 8
+
+# Scan position saved after each sequential search so the next run only
+# compares images appended since (see handle_duplicates)
+DUPLICATE_STATE_FILENAME = ".duplicate_state.json"
+DUPLICATE_STATE_VERSION = 1
+
+# (sorted class ids, mean centre x, mean centre y, mean size, mean width,
+# mean height)
+LabelSignature = Tuple[Tuple[int, ...], float, float, float, float, float]
 
 
 def unique_target_path(img_dir: str, label_dir: str, filename: str) -> Tuple[str, str]:
@@ -19,6 +96,43 @@ def unique_target_path(img_dir: str, label_dir: str, filename: str) -> Tuple[str
         idx += 1
 
 
+class TargetNamer:
+    """
+    Collision-safe target names in a pair of image/label folders, with the
+    same results as unique_target_path. Each folder is listed once; names
+    handed out are remembered, and the next _dupN suffix to try is kept per
+    filename, so no file is stat-ed while naming.
+    """
+
+    def __init__(self, img_dir: str, label_dir: str):
+        self.img_dir = img_dir
+        self.label_dir = label_dir
+        self._images = set(os.listdir(img_dir)) if os.path.isdir(img_dir) else set()
+        self._labels = set(os.listdir(label_dir)) if os.path.isdir(label_dir) else set()
+        self._next_suffix: Dict[str, int] = {}
+
+    def _taken(self, candidate_name: str) -> bool:
+        label_name = os.path.splitext(candidate_name)[0] + ".txt"
+        return candidate_name in self._images or label_name in self._labels
+
+    def reserve(self, filename: str) -> Tuple[str, str]:
+        """Return (image, label) target paths for filename and mark them taken."""
+        name, ext = os.path.splitext(filename)
+        candidate_name = filename
+        idx = self._next_suffix.get(filename, 1)
+        if idx > 1 or self._taken(candidate_name):
+            candidate_name = f"{name}_dup{idx}{ext}"
+            while self._taken(candidate_name):
+                idx += 1
+                candidate_name = f"{name}_dup{idx}{ext}"
+            self._next_suffix[filename] = idx + 1
+
+        label_name = os.path.splitext(candidate_name)[0] + ".txt"
+        self._images.add(candidate_name)
+        self._labels.add(label_name)
+        return os.path.join(self.img_dir, candidate_name), os.path.join(self.label_dir, label_name)
+
+
 def get_label_path(image_path: str) -> str:
     """Convert image path to corresponding label path."""
     label_path = image_path.replace("images", "labels")
@@ -28,35 +142,26 @@ def get_label_path(image_path: str) -> str:
     return label_path
 
 
-def parse_yolo_labels(image_path: str) -> List[Tuple[int, float, float, float, float]]:
+def parse_yolo_labels(
+    image_path: str,
+    cache: Optional[LabelCache] = None,
+) -> List[YoloLabel]:
     """
     Parse YOLO format labels from file.
-    Returns list of (class_id, x_center, y_center, width, height).
+    Returns list of (class_id, x_center, y_center, width, height), or
+    (class_id, x1, y1, x2, y2, x3, y3, x4, y4) for OBB lines.
     All coordinates are normalized [0, 1].
+
+    Args:
+        cache: Optional parsed-label cache; the file is only read on a miss.
     """
     label_path = get_label_path(image_path)
 
-    if not os.path.exists(label_path):
-        return []
+    return [(int(row[0]),) + tuple(row[1:]) for row in get_label_rows(label_path, cache)]
 
-    labels = []
-    with open(label_path, "r", encoding="utf-8") as f:
-        for line in f:
-            parts = line.strip().split()
-            if len(parts) < 5:
-                continue
-
-            try:
-                class_id = int(float(parts[0]))
-                x_center = float(parts[1])
-                y_center = float(parts[2])
-                width = float(parts[3])
-                height = float(parts[4])
-                labels.append((class_id, x_center, y_center, width, height))
-            except (ValueError, IndexError):
-                continue
 
-    return labels
+def has_obb_labels(labels: List[YoloLabel]) -> bool:
+    return any(len(label) >= 9 for label in labels)
 
 
 def calculate_iou(box1: Tuple[float, float, float, float],
@@ -94,18 +199,22 @@ def calculate_iou(box1: Tuple[float, float, float, float],
     return inter_area / union_area
 
 
-def labels_are_similar(labels1: List[Tuple[int, float, float, float, float]],
-                       labels2: List[Tuple[int, float, float, float, float]],
+def labels_are_similar(labels1: List[YoloLabel],
+                       labels2: List[YoloLabel],
                        iou_threshold: float,
                        labels_limit: int = 0) -> bool:
     """
     Check if two label sets are similar based on class matching and IoU threshold.
     For multiple boxes of the same class, finds optimal matching using greedy algorithm.
     Returns True if both have same number of boxes, all classes match, and all IoUs exceed threshold.
+    Label sets with OBB lines are compared as polygons (see labels_are_similar_obb).
 
     Args:
         labels_limit: Number of labels to compare (0 = all labels).
     """
+    if has_obb_labels(labels1) or has_obb_labels(labels2):
+        return labels_are_similar_obb(labels1, labels2, iou_threshold, labels_limit)
+
     if labels_limit > 0:
         labels1 = labels1[:labels_limit]
         labels2 = labels2[:labels_limit]
@@ -160,19 +269,258 @@ def labels_are_similar(labels1: List[Tuple[int, float, float, float, float]],
     return True
 
 
+def labels_are_similar_numpy(labels1: List[YoloLabel],
+                             labels2: List[YoloLabel],
+                             iou_threshold: float,
+                             labels_limit: int = 0) -> bool:
+    """
+    Vectorized labels_are_similar with the same greedy matching and result.
+    The class-masked IoU matrix of all box pairs is computed in one call;
+    each box of labels1 (in order) then takes the unused same-class box of
+    labels2 with the highest IoU, the first one on ties.
+
+    Args:
+        labels_limit: Number of labels to compare (0 = all labels).
+    """
+    if has_obb_labels(labels1) or has_obb_labels(labels2):
+        return labels_are_similar_obb(labels1, labels2, iou_threshold, labels_limit)
+
+    if labels_limit > 0:
+        labels1 = labels1[:labels_limit]
+        labels2 = labels2[:labels_limit]
+
+    if len(labels1) != len(labels2):
+        return False
+
+    if len(labels1) == 0:
+        return False
+
+    array1 = np.asarray(labels1, dtype=np.float64)
+    array2 = np.asarray(labels2, dtype=np.float64)
+    if not np.array_equal(np.sort(array1[:, 0]), np.sort(array2[:, 0])):
+        return False
+
+    iou = box_iou_matrix(array1[:, 1:5], array2[:, 1:5])
+    iou[array1[:, 0, None] != array2[None, :, 0]] = -np.inf
+    return greedy_match(iou, iou_threshold)
+
+
+def greedy_match(iou: np.ndarray, iou_threshold: float) -> bool:
+    """
+    Match each row (in order) to the unused column with the highest IoU, the
+    first one on ties, as labels_are_similar does. Pairs that must not match
+    (different classes) hold -inf. True when every pick reaches the threshold.
+    """
+    # A greedy pick can never beat the row's unconstrained best
+    best_idx = np.argmax(iou, axis=1)
+    best_iou = iou[np.arange(len(iou)), best_idx]
+    if (best_iou < iou_threshold).any():
+        return False
+
+    # Every row's best column is distinct: greedy picks exactly those
+    if len(np.unique(best_idx)) == len(best_idx):
+        return True
+
+    used = np.zeros(iou.shape[1], dtype=bool)
+    for row in iou:
+        candidates = np.where(used, -np.inf, row)
+        idx = int(np.argmax(candidates))
+        if candidates[idx] < iou_threshold:
+            return False
+        used[idx] = True
+
+    return True
+
+
+def labels_are_similar_obb(labels1: List[YoloLabel],
+                           labels2: List[YoloLabel],
+                           iou_threshold: float,
+                           labels_limit: int = 0) -> bool:
+    """
+    labels_are_similar for label sets with OBB lines. Every label becomes a
+    quadrilateral (boxes as axis-aligned ones, OBB corners ordered clockwise
+    as at ingest) and same-class pairs are compared by polygon IoU, clipped
+    in one batch; matching is the same greedy pass. Pairs whose extents and
+    areas cannot reach the threshold are never clipped, and frames of up to
+    OBB_SCALAR_MAX_LABELS labels are compared in plain Python.
+
+    Args:
+        labels_limit: Number of labels to compare (0 = all labels).
+    """
+    if labels_limit > 0:
+        labels1 = labels1[:labels_limit]
+        labels2 = labels2[:labels_limit]
+
+    if len(labels1) != len(labels2):
+        return False
+
+    if len(labels1) == 0:
+        return False
+
+    if sorted(label[0] for label in labels1) != sorted(label[0] for label in labels2):
+        return False
+
+    if len(labels1) <= OBB_SCALAR_MAX_LABELS:
+        return labels_are_similar_obb_scalar(labels1, labels2, iou_threshold)
+
+    classes1 = np.array([label[0] for label in labels1])
+    classes2 = np.array([label[0] for label in labels2])
+    quads = rows_to_quads(list(labels1) + list(labels2))
+    same_class = classes1[:, None] == classes2[None, :]
+    iou = quad_iou_matrix(
+        quads[:len(labels1)], quads[len(labels1):], pair_mask=same_class, min_iou=iou_threshold
+    )
+    iou[~same_class] = -np.inf
+    return greedy_match(iou, iou_threshold)
+
+
+def labels_are_similar_obb_scalar(labels1: List[YoloLabel],
+                                  labels2: List[YoloLabel],
+                                  iou_threshold: float) -> bool:
+    """
+    labels_are_similar_obb for a few labels, one pair at a time without
+    NumPy, whose fixed per-call cost dominates small frames. Expects label
+    sets of equal length and class multiset (checked by the caller).
+    """
+    quads1 = [row_to_quad(label) for label in labels1]
+    quads2 = [row_to_quad(label) for label in labels2]
+    areas1 = [polygon_area(quad) for quad in quads1]
+    areas2 = [polygon_area(quad) for quad in quads2]
+    extents2 = [
+        (min(x for x, _ in quad), min(y for _, y in quad), max(x for x, _ in quad), max(y for _, y in quad))
+        for quad in quads2
+    ]
+
+    used = [False] * len(labels2)
+    for label1, quad1, area1 in zip(labels1, quads1, areas1):
+        low_x = min(x for x, _ in quad1)
+        low_y = min(y for _, y in quad1)
+        high_x = max(x for x, _ in quad1)
+        high_y = max(y for _, y in quad1)
+
+        best_iou = -math.inf
+        best_idx = -1
+        for idx, label2 in enumerate(labels2):
+            if used[idx] or label2[0] != label1[0]:
+                continue
+            low_x2, low_y2, high_x2, high_y2 = extents2[idx]
+            # Pairs that cannot reach the threshold never decide a match
+            if not (low_x < high_x2 and low_x2 < high_x and low_y < high_y2 and low_y2 < high_y):
+                iou = 0.0
+            else:
+                extent_overlap = (min(high_x, high_x2) - max(low_x, low_x2)) * (
+                    min(high_y, high_y2) - max(low_y, low_y2)
+                )
+                if iou_upper_bound(extent_overlap, abs(area1), abs(areas2[idx])) < iou_threshold:
+                    iou = 0.0
+                else:
+                    iou = quad_iou(quad1, quads2[idx], area1, areas2[idx])
+            if iou > best_iou:
+                best_iou = iou
+                best_idx = idx
+
+        if best_iou < iou_threshold:
+            return False
+
+        used[best_idx] = True
+
+    return True
+
+
+def labels_are_similar_auto(labels1: List[YoloLabel],
+                            labels2: List[YoloLabel],
+                            iou_threshold: float,
+                            labels_limit: int = 0) -> bool:
+    """Use the NumPy comparator for dense frames and the Python one otherwise."""
+    if min(len(labels1), len(labels2)) >= NUMPY_MIN_BOXES:
+        return labels_are_similar_numpy(labels1, labels2, iou_threshold, labels_limit)
+    return labels_are_similar(labels1, labels2, iou_threshold, labels_limit)
+
+
+def get_similarity_function(engine: str = "auto") -> Callable[..., bool]:
+    """Return the label comparator for engine: auto, numpy or python."""
+    if engine == "numpy":
+        return labels_are_similar_numpy
+    if engine == "python":
+        return labels_are_similar
+    if engine == "auto":
+        return labels_are_similar_auto
+    raise ValueError(f"Unknown similarity engine: {engine}")
+
+
+class LabelPrefetcher:
+    """
+    Parses the labels of image_paths on a thread pool, up to read_ahead files
+    past the highest index requested so far. The scan only moves forward:
+    get(i) returns image i's labels (waiting for its read if needed) and
+    release(i) drops everything before i, so each file is read once and at
+    most a window of parsed labels is held in memory.
+    """
+
+    def __init__(
+        self,
+        image_paths: Sequence[str],
+        cache: Optional[LabelCache] = None,
+        threads: int = PREFETCH_THREADS,
+        read_ahead: int = PREFETCH_WINDOW,
+    ):
+        self.image_paths = image_paths
+        self.cache = cache
+        self.read_ahead = read_ahead
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="label-prefetch")
+        self._futures: Dict[int, Future] = {}
+        self._next = 0
+
+    def get(self, i: int) -> List[YoloLabel]:
+        self._next = max(self._next, i)
+        stop = min(len(self.image_paths), i + 1 + self.read_ahead)
+        while self._next < stop:
+            self._futures[self._next] = self._executor.submit(
+                parse_yolo_labels, self.image_paths[self._next], self.cache
+            )
+            self._next += 1
+        return self._futures[i].result()
+
+    def release(self, before: int) -> None:
+        for i in [i for i in self._futures if i < before]:
+            self._futures.pop(i).cancel()
+        self._next = max(self._next, before)
+
+    def close(self) -> None:
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "LabelPrefetcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
 def find_duplicate_groups(
     image_paths: Sequence[str],
     iou_threshold: float,
     dataset_path: str = "",
     labels_limit: int = 0,
+    cache: Optional[LabelCache] = None,
+    engine: str = "auto",
+    hash_rule: Optional[ImageHashRule] = None,
 ) -> List[List[int]]:
     """
     Find duplicate groups using sequential comparison based on filename order.
-    Only uses label comparison (class + bounding box IoU).
+    Uses label comparison (class + bounding box IoU), combined with image
+    hashes when a hash rule is given.
 
     Args:
         labels_limit: Number of labels to compare (0 = all labels).
+        cache: Optional parsed-label cache shared across runs.
+        engine: Label comparator (see get_similarity_function).
+        hash_rule: Optional image hash rule, already loaded with the hashes
+            of image_paths (see ImageHashRule.load).
     """
+    similar = get_similarity_function(engine)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     n = len(image_paths)
 
@@ -180,13 +528,21 @@ def find_duplicate_groups(
         print(f"Labels limit: comparing only first {labels_limit} labels for duplicate detection")
 
     print(f"Finding duplicates in {n} images using IoU threshold {iou_threshold}")
+    if hash_rule is not None:
+        print(
+            f"Combining labels with {hash_rule.kind} (rule={hash_rule.rule}, "
+            f"max distance {hash_rule.max_distance})"
+        )
+
+    # With the "or" rule, images without labels can still match by hash
+    compare_unlabeled = hash_rule is not None and hash_rule.rule == "or"
 
     groups: List[List[int]] = []
     visited = [False] * n
 
     log_dir = dataset_path or "."
     log_path = os.path.join(log_dir, f"similar_path_{timestamp}.txt")
-    with open(log_path, "w", encoding="utf-8") as f:
+    with open(log_path, "w", encoding="utf-8") as f, LabelPrefetcher(image_paths, cache) as labels:
         i = 0
         while i < n:
             if visited[i]:
@@ -195,9 +551,10 @@ def find_duplicate_groups(
 
             current_group = [i]
             visited[i] = True
-            base_labels = parse_yolo_labels(image_paths[i])
+            base_labels = labels.get(i)
+            labels.release(i + 1)
 
-            if not base_labels:
+            if not base_labels and not compare_unlabeled:
                 i += 1
                 continue
 
@@ -207,12 +564,23 @@ def find_duplicate_groups(
                     j += 1
                     continue
 
-                compare_labels = parse_yolo_labels(image_paths[j])
+                # A mismatching file stays in the window: it is the next base
+                compare_labels = labels.get(j)
+
+                labels_match = similar(base_labels, compare_labels, iou_threshold, labels_limit)
+                is_duplicate = labels_match
+                if hash_rule is not None:
+                    is_duplicate = hash_rule.combine(labels_match, image_paths[i], image_paths[j])
 
-                if labels_are_similar(base_labels, compare_labels, iou_threshold, labels_limit):
+                if is_duplicate:
+                    labels.release(j + 1)
                     current_group.append(j)
                     visited[j] = True
-                    f.write(f"Similar labels (IoU >= {iou_threshold})\n")
+                    reason = f"Similar labels (IoU >= {iou_threshold})" if labels_match else "Similar images"
+                    if hash_rule is not None:
+                        distance = hash_rule.distance(image_paths[i], image_paths[j])
+                        reason += f", {hash_rule.kind} distance {distance}"
+                    f.write(f"{reason}\n")
                     f.write(f"  base: {image_paths[i]}\n")
                     f.write(f"  match: {image_paths[j]}\n")
                 else:
@@ -228,6 +596,491 @@ def find_duplicate_groups(
     return groups
 
 
+def scan_run(
+    image_paths: Sequence[str],
+    base: int,
+    iou_threshold: float,
+    labels_limit: int,
+    cache: Optional[LabelCache],
+    similar: Callable[..., bool],
+    open_end: bool = False,
+) -> Optional[int]:
+    """
+    Extend a run from base the way find_duplicate_groups does: following
+    images join while they match base. Returns the index just past the run,
+    which is the next base. With open_end, returns None when the run reaches
+    the end of image_paths (it may continue past a chunk boundary).
+    """
+    base_labels = parse_yolo_labels(image_paths[base], cache)
+    if not base_labels:
+        return base + 1
+
+    j = base + 1
+    while j < len(image_paths):
+        compare_labels = parse_yolo_labels(image_paths[j], cache)
+        if not similar(base_labels, compare_labels, iou_threshold, labels_limit):
+            return j
+        j += 1
+
+    return None if open_end else j
+
+
+_worker_cache: Optional[LabelCache] = None
+
+
+def _init_scan_worker(cache_path: Optional[str], cache_max_entries: int) -> None:
+    global _worker_cache
+    if cache_path:
+        _worker_cache = LabelCache(cache_path, cache_max_entries)
+
+
+def _scan_chunk(
+    chunk_paths: List[str],
+    last_chunk: bool,
+    iou_threshold: float,
+    labels_limit: int,
+    engine: str,
+) -> Dict[int, Optional[int]]:
+    """
+    Run the sequential scan over one chunk as if its first image were a
+    base. Returns {base: next base} for the chain of bases found, with
+    chunk-relative indices; None marks the run cut off by the chunk end.
+    """
+    similar = get_similarity_function(engine)
+    runs: Dict[int, Optional[int]] = {}
+    base = 0
+    while base < len(chunk_paths):
+        end = scan_run(
+            chunk_paths, base, iou_threshold, labels_limit, _worker_cache, similar, open_end=not last_chunk
+        )
+        runs[base] = end
+        if end is None:
+            break
+        base = end
+    if _worker_cache is not None:
+        _worker_cache.flush()
+    return runs
+
+
+def find_duplicate_groups_parallel(
+    image_paths: Sequence[str],
+    iou_threshold: float,
+    dataset_path: str = "",
+    labels_limit: int = 0,
+    cache: Optional[LabelCache] = None,
+    engine: str = "auto",
+    workers: int = 2,
+    chunk_size: int = 0,
+) -> List[List[int]]:
+    """
+    find_duplicate_groups split across worker processes, with identical groups.
+
+    The sorted file list is cut into chunks and each worker scans its chunk
+    assuming the chunk starts on a base. The chains are then stitched in
+    order: the true scan position is carried from chunk to chunk, and when
+    it is not one of the chunk's bases (a run crossed the boundary) runs are
+    rescanned here until the position joins the chunk's chain. Runs cut off
+    at a chunk end are also finished here.
+
+    Args:
+        labels_limit: Number of labels to compare (0 = all labels).
+        cache: Optional parsed-label cache; workers open their own
+            connection to the same file.
+        engine: Label comparator (see get_similarity_function).
+        workers: Worker processes.
+        chunk_size: Images per chunk (0 = split evenly, at least
+            PARALLEL_MIN_CHUNK per chunk).
+    """
+    n = len(image_paths)
+    if chunk_size <= 0:
+        chunk_size = max(PARALLEL_MIN_CHUNK, -(-n // (workers * 4)))
+    if workers <= 1 or n <= chunk_size:
+        return find_duplicate_groups(
+            image_paths, iou_threshold, dataset_path, labels_limit, cache=cache, engine=engine
+        )
+
+    similar = get_similarity_function(engine)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    if labels_limit > 0:
+        print(f"Labels limit: comparing only first {labels_limit} labels for duplicate detection")
+
+    starts = list(range(0, n, chunk_size))
+    print(
+        f"Finding duplicates in {n} images using IoU threshold {iou_threshold} "
+        f"({len(starts)} chunks on {workers} workers)"
+    )
+
+    if cache is not None:
+        cache.flush()
+        cache_args = (cache.db_path, cache.max_entries)
+    else:
+        cache_args = (None, 0)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_scan_worker,
+        initargs=cache_args,
+    ) as executor:
+        futures = [
+            executor.submit(
+                _scan_chunk,
+                list(image_paths[start:start + chunk_size]),
+                start + chunk_size >= n,
+                iou_threshold,
+                labels_limit,
+                engine,
+            )
+            for start in starts
+        ]
+
+        groups: List[List[int]] = []
+        rescanned = 0
+        base = 0
+        for start, future in zip(starts, futures):
+            stop = min(start + chunk_size, n)
+            runs = future.result()
+            while base < stop:
+                end = runs.get(base - start)
+                if end is None:
+                    end = scan_run(image_paths, base, iou_threshold, labels_limit, cache, similar)
+                    rescanned += 1
+                else:
+                    end += start
+                if end - base > 1:
+                    groups.append(list(range(base, end)))
+                base = end
+
+    print(f"Stitched {len(starts)} chunks ({rescanned} run(s) rescanned at chunk boundaries)")
+
+    log_dir = dataset_path or "."
+    log_path = os.path.join(log_dir, f"similar_path_{timestamp}.txt")
+    with open(log_path, "w", encoding="utf-8") as f:
+        for group in groups:
+            for j in group[1:]:
+                f.write(f"Similar labels (IoU >= {iou_threshold})\n")
+                f.write(f"  base: {image_paths[group[0]]}\n")
+                f.write(f"  match: {image_paths[j]}\n")
+
+    return groups
+
+
+def label_extent(label: YoloLabel) -> Tuple[float, float, float, float, float]:
+    """
+    (centre x, centre y, square root of the area, width, height) of a box or
+    OBB label. OBB labels use their corner centroid, their axis-aligned
+    extent widened by OBB_REACH_MARGIN and their polygon area.
+    """
+    if len(label) < 9:
+        width = abs(label[3])
+        height = abs(label[4])
+        return label[1], label[2], math.sqrt(width * height), width, height
+
+    xs = label[1:9:2]
+    ys = label[2:9:2]
+    twice_area = sum(xs[i] * ys[i - 3] - xs[i - 3] * ys[i] for i in range(4))
+    return (
+        sum(xs) / 4,
+        sum(ys) / 4,
+        math.sqrt(abs(twice_area) / 2),
+        (max(xs) - min(xs)) * OBB_REACH_MARGIN,
+        (max(ys) - min(ys)) * OBB_REACH_MARGIN,
+    )
+
+
+def label_signature(labels: List[YoloLabel], labels_limit: int = 0) -> Optional[LabelSignature]:
+    """
+    Summary of a label set for the global search: the class multiset plus
+    the mean box centre, size (square root of the area), width and height.
+    Returns None for images without labels, which are never duplicates.
+
+    Args:
+        labels_limit: Number of labels to compare (0 = all labels).
+    """
+    if labels_limit > 0:
+        labels = labels[:labels_limit]
+    if not labels:
+        return None
+
+    count = len(labels)
+    extents = [label_extent(label) for label in labels]
+    means = tuple(sum(extent[k] for extent in extents) / count for k in range(5))
+    if not all(math.isfinite(value) for value in means):
+        return None
+
+    classes = tuple(sorted(label[0] for label in labels))
+    return (classes,) + means
+
+
+def search_reach(
+    signature: LabelSignature,
+    iou_threshold: float,
+) -> Tuple[float, float, float, float]:
+    """
+    How far the mean centre and size of a matching label set can be from
+    this one: (max x offset, max y offset, min size, max size).
+
+    For two boxes with IoU >= t, the overlap width is at most the mean of
+    the widths minus the x offset, and the overlap is at least
+    t * (area1 + area2) / (1 + t), so |dx| <= (w1 + w2) / 2 * (1 - t) / (1 + t).
+    IoU >= t also limits w2 to w1 / t, giving |dx| <= w1 * (1 - t) / (2t);
+    the same holds for y, and the areas differ by at most a factor t.
+    Matched boxes pair up one to one, so the bounds carry over to the means.
+    """
+    _classes, _x, _y, size, width, height = signature
+    if iou_threshold <= 0:
+        return math.inf, math.inf, 0.0, math.inf
+
+    # Slightly widened so rounding never drops a pair sitting on the bound
+    factor = (1 - iou_threshold) / (2 * iou_threshold) * (1 + 1e-9)
+    size_ratio = math.sqrt(iou_threshold)
+    return (
+        width * factor + 1e-12,
+        height * factor + 1e-12,
+        size * size_ratio * (1 - 1e-9),
+        size / size_ratio * (1 + 1e-9) + 1e-12,
+    )
+
+
+def _cell(value: float, cell_size: float) -> int:
+    return math.floor(value / cell_size)
+
+
+def find_duplicate_groups_global(
+    image_paths: Sequence[str],
+    iou_threshold: float,
+    dataset_path: str = "",
+    labels_limit: int = 0,
+    cache: Optional[LabelCache] = None,
+    engine: str = "auto",
+    cell_size: float = SIGNATURE_CELL_SIZE,
+) -> List[List[int]]:
+    """
+    Find duplicate groups across the whole dataset, not just adjacent files.
+
+    Every image is bucketed by class multiset and by its mean box centre
+    and size on a grid. An image is only compared with later images whose
+    means lie within search_reach of its own, found by probing the grid
+    cells that range covers, so the cost grows with the number of nearby
+    label sets instead of the square of the dataset size. For box labels the
+    reach is a proven bound and no pair that labels_are_similar accepts is
+    skipped; for OBB labels it is a widened estimate. As in the sequential
+    search, each group keeps its earliest image (filename order) as the base
+    and every other member matched that base.
+
+    Args:
+        labels_limit: Number of labels to compare (0 = all labels).
+        cache: Optional parsed-label cache shared across runs.
+        engine: Label comparator (see get_similarity_function).
+        cell_size: Grid cell for bucketing; affects speed, not results.
+    """
+    similar = get_similarity_function(engine)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    n = len(image_paths)
+
+    if labels_limit > 0:
+        print(f"Labels limit: comparing only first {labels_limit} labels for duplicate detection")
+
+    print(f"Finding duplicates globally in {n} images using IoU threshold {iou_threshold}")
+
+    # {class multiset: {(x cell, y cell, size cell): image indices}}
+    signatures: List[Optional[LabelSignature]] = []
+    buckets: Dict[Tuple[int, ...], Dict[Tuple[int, int, int], List[int]]] = defaultdict(
+        lambda: defaultdict(list)
+    )
+    for i, image_path in enumerate(image_paths):
+        signature = label_signature(parse_yolo_labels(image_path, cache), labels_limit)
+        signatures.append(signature)
+        if signature is not None:
+            classes, x, y, size = signature[:4]
+            buckets[classes][(_cell(x, cell_size), _cell(y, cell_size), _cell(size, cell_size))].append(i)
+
+    labeled = sum(signature is not None for signature in signatures)
+    cells = sum(len(cells) for cells in buckets.values())
+    print(f"Indexed {labeled} labeled images into {cells} cells over {len(buckets)} class sets")
+
+    groups: List[List[int]] = []
+    visited = [False] * n
+    comparisons = 0
+
+    log_dir = dataset_path or "."
+    log_path = os.path.join(log_dir, f"similar_path_{timestamp}.txt")
+    with open(log_path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            signature = signatures[i]
+            if visited[i] or signature is None:
+                continue
+            visited[i] = True
+
+            classes, x, y, size = signature[:4]
+            reach_x, reach_y, min_size, max_size = search_reach(signature, iou_threshold)
+            class_cells = buckets[classes]
+            ranges = [
+                (x - reach_x, x + reach_x),
+                (y - reach_y, y + reach_y),
+                (min_size, max_size),
+            ]
+            probed = 1.0
+            for low, high in ranges:
+                probed *= (high - low) / cell_size + 1
+            if probed > min(MAX_PROBED_CELLS, len(class_cells)):
+                cell_lists = list(class_cells.values())
+            else:
+                x_cells, y_cells, size_cells = (
+                    range(_cell(low, cell_size), _cell(high, cell_size) + 1) for low, high in ranges
+                )
+                cell_lists = [
+                    class_cells.get((cx, cy, cs), ())
+                    for cx in x_cells
+                    for cy in y_cells
+                    for cs in size_cells
+                ]
+
+            candidates = sorted(
+                j
+                for cell in cell_lists
+                for j in cell
+                if j > i
+                and not visited[j]
+                and abs(signatures[j][1] - x) <= reach_x
+                and abs(signatures[j][2] - y) <= reach_y
+                and min_size <= signatures[j][3] <= max_size
+            )
+            if not candidates:
+                continue
+
+            current_group = [i]
+            base_labels = parse_yolo_labels(image_paths[i], cache)
+            for j in candidates:
+                comparisons += 1
+                compare_labels = parse_yolo_labels(image_paths[j], cache)
+                if similar(base_labels, compare_labels, iou_threshold, labels_limit):
+                    current_group.append(j)
+                    visited[j] = True
+                    f.write(f"Similar labels (IoU >= {iou_threshold})\n")
+                    f.write(f"  base: {image_paths[i]}\n")
+                    f.write(f"  match: {image_paths[j]}\n")
+
+            if len(current_group) > 1:
+                groups.append(current_group)
+
+    print(f"Compared {comparisons} candidate pair(s)")
+    return groups
+
+
+def label_file_signature(image_path: str) -> Optional[List[int]]:
+    """[size, mtime_ns] of the image's label file, or None if it is missing."""
+    try:
+        stat = os.stat(get_label_path(image_path))
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_duplicate_state(dataset_base: str) -> Optional[dict]:
+    path = os.path.join(dataset_base, DUPLICATE_STATE_FILENAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read {path}: {e}")
+        return None
+    if not isinstance(state, dict) or state.get("version") != DUPLICATE_STATE_VERSION:
+        return None
+    return state
+
+
+def save_duplicate_state(dataset_base: str, state: dict) -> None:
+    path = os.path.join(dataset_base, DUPLICATE_STATE_FILENAME)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not write {path}: {e}")
+
+
+def build_duplicate_state(
+    image_paths: Sequence[str],
+    groups: List[List[int]],
+    iou_threshold: float,
+    labels_limit: int,
+    image_count: int,
+    image_hash: Optional[list] = None,
+) -> dict:
+    """
+    Record where a sequential scan over image_paths stopped: the last
+    filename seen (high-water mark) and the base of the final run, which new
+    files appended after the mark must be compared with first.
+
+    Args:
+        image_count: Images left in the folder after duplicates were handled.
+        image_hash: Settings of the image hash rule in use, if any.
+    """
+    last = len(image_paths) - 1
+    # The last file either ended the final group or was a base itself
+    boundary = groups[-1][0] if groups and groups[-1][-1] == last else last
+    return {
+        "version": DUPLICATE_STATE_VERSION,
+        "iou_threshold": iou_threshold,
+        "labels_limit": labels_limit,
+        "image_hash": image_hash,
+        "high_water": os.path.basename(image_paths[last]),
+        "boundary": os.path.basename(image_paths[boundary]),
+        "boundary_label": label_file_signature(image_paths[boundary]),
+        "image_count": image_count,
+    }
+
+
+def incremental_filenames(
+    state: Optional[dict],
+    filenames: List[str],
+    img_dir: str,
+    iou_threshold: float,
+    labels_limit: int,
+    image_hash: Optional[list] = None,
+) -> Optional[List[str]]:
+    """
+    Filenames to scan to continue from a saved state: the boundary base
+    followed by the files sorted after the high-water mark. Returns None
+    when the state does not apply and the whole folder must be scanned
+    (settings changed, files at or below the mark were added or removed,
+    or the boundary file or its label changed).
+    """
+    if state is None:
+        return None
+    if (
+        state.get("iou_threshold") != iou_threshold
+        or state.get("labels_limit") != labels_limit
+        or state.get("image_hash") != image_hash
+    ):
+        print("Duplicate settings changed since the last run; scanning all images")
+        return None
+
+    high_water = state.get("high_water")
+    boundary = state.get("boundary")
+    if not isinstance(high_water, str) or not isinstance(boundary, str):
+        return None
+
+    split = bisect.bisect_right(filenames, high_water)
+    if split != state.get("image_count"):
+        print("Images at or before the last scanned file changed; scanning all images")
+        return None
+
+    boundary_idx = bisect.bisect_left(filenames, boundary, 0, split)
+    if boundary_idx == split or filenames[boundary_idx] != boundary:
+        print(f"Boundary image {boundary} is gone; scanning all images")
+        return None
+    if label_file_signature(os.path.join(img_dir, boundary)) != state.get("boundary_label"):
+        print(f"Label of boundary image {boundary} changed; scanning all images")
+        return None
+
+    return [boundary] + filenames[split:]
+
+
 def get_matching_rule(
     dataset_path: str,
     rules: List[dict],
@@ -262,43 +1115,73 @@ def get_matching_rule(
     return {"action": winner.get("action", default_action), "labels": winner.get("labels", 0)}
 
 
+def _apply_file_op(op: Tuple[str, str, Optional[str]]) -> None:
+    kind, src, dst = op
+    if kind == "rename":
+        os.rename(src, dst)
+    elif kind == "remove":
+        os.remove(src)
+    else:
+        with open(dst, "w", encoding="utf-8") as f:
+            f.write("# Label file was missing for this duplicate\n")
+
+
 def process_duplicates(
     dataset_base: str,
     groups: List[List[int]],
     image_paths: List[str],
     debug: bool,
     action: str = "move",
-) -> None:
+    index: Optional[DatasetIndex] = None,
+) -> int:
     """
     Process duplicate groups based on the specified action.
+    Targets are planned up front (see TargetNamer), then the renames and
+    deletions run on a pool of MOVE_THREADS threads.
 
     Args:
         action: "move" to move to duplicate/ folder, "delete" to remove directly.
+        index: Directory index of dataset_base; updated as files are moved or
+            deleted (scanned here when not provided).
+
+    Returns:
+        int: Number of images moved or deleted.
     """
+    if index is None:
+        index = DatasetIndex(dataset_base)
+
+    # (kind, source, target): "rename", "remove" or "placeholder" (write a
+    # note where a missing label would have gone)
+    ops: List[Tuple[str, str, Optional[str]]] = []
+    handled = 0
+
     if action == "delete":
         # Delete duplicates directly without moving to duplicate folder
         for group_idx, group in enumerate(groups, start=1):
             keep_idx = group[0]
             files_to_delete = group if debug else group[1:]
+            handled += len(files_to_delete)
 
             for idx in files_to_delete:
                 src_img = image_paths[idx]
-                stem = os.path.splitext(os.path.basename(src_img))[0]
-                src_label = os.path.join(dataset_base, "labels", stem + ".txt")
+                img_name = os.path.basename(src_img)
+                stem = os.path.splitext(img_name)[0]
 
                 # Delete image
-                if os.path.exists(src_img):
-                    os.remove(src_img)
+                if img_name in index.images:
+                    ops.append(("remove", src_img, None))
+                    index.discard_image(img_name)
 
                 # Delete label
-                if os.path.exists(src_label):
-                    os.remove(src_label)
+                if index.has_label(stem):
+                    ops.append(("remove", index.label_path(stem), None))
+                    index.discard_label(stem + ".txt")
 
             if debug:
-                print(f"Deleted all {len(group)} duplicates in group {group_idx}")
+                print(f"Deleting all {len(group)} duplicates in group {group_idx}")
             else:
                 kept = image_paths[keep_idx]
-                print(f"Kept original: {kept}; deleted {len(group) - 1} duplicates")
+                print(f"Kept original: {kept}; deleting {len(group) - 1} duplicates")
     else:
         # Move duplicates to duplicate/ folder (default behavior)
         dup_root = os.path.join(dataset_base, "duplicate")
@@ -306,6 +1189,7 @@ def process_duplicates(
         dup_label_root = os.path.join(dup_root, "labels")
         os.makedirs(dup_img_root, exist_ok=True)
         os.makedirs(dup_label_root, exist_ok=True)
+        namer = None if debug else TargetNamer(dup_img_root, dup_label_root)
 
         for group_idx, group in enumerate(groups, start=1):
             keep_idx = group[0]
@@ -319,37 +1203,45 @@ def process_duplicates(
                 os.makedirs(group_folder_label, exist_ok=True)
 
             files_to_move = group if debug else group[1:]
+            handled += len(files_to_move)
 
             for idx in files_to_move:
                 src_img = image_paths[idx]
-                stem, ext = os.path.splitext(os.path.basename(src_img))
-                target_img_dir = group_folder_img
-                target_label_dir = group_folder_label
+                img_name = os.path.basename(src_img)
+                stem = os.path.splitext(img_name)[0]
 
                 if debug:
-                    target_img = os.path.join(target_img_dir, os.path.basename(src_img))
-                    target_label = os.path.join(target_label_dir, stem + ".txt")
+                    target_img = os.path.join(group_folder_img, img_name)
+                    target_label = os.path.join(group_folder_label, stem + ".txt")
                 else:
-                    target_img, target_label = unique_target_path(
-                        target_img_dir, target_label_dir, os.path.basename(src_img)
-                    )
+                    target_img, target_label = namer.reserve(img_name)
 
-                os.makedirs(os.path.dirname(target_img), exist_ok=True)
-                os.makedirs(os.path.dirname(target_label), exist_ok=True)
-                os.rename(src_img, target_img)
+                ops.append(("rename", src_img, target_img))
+                index.discard_image(img_name)
 
-                src_label = os.path.join(dataset_base, "labels", stem + ".txt")
-                if os.path.exists(src_label):
-                    os.rename(src_label, target_label)
+                if index.has_label(stem):
+                    ops.append(("rename", index.label_path(stem), target_label))
+                    index.discard_label(stem + ".txt")
                 else:
-                    with open(target_label, "w", encoding="utf-8") as f:
-                        f.write("# Label file was missing for this duplicate\n")
+                    ops.append(("placeholder", src_img, target_label))
 
             if debug:
-                print(f"Moved all {len(group)} duplicates to {group_folder_img}")
+                print(f"Moving all {len(group)} duplicates to {group_folder_img}")
             else:
                 kept = image_paths[keep_idx]
-                print(f"Kept original: {kept}; moved {len(group) - 1} duplicates to {dup_root}")
+                print(f"Kept original: {kept}; moving {len(group) - 1} duplicates to {dup_root}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=MOVE_THREADS, thread_name_prefix="duplicate-move") as executor:
+        # Consume the results so the first failure is raised here
+        for _ in executor.map(_apply_file_op, ops):
+            pass
+    elapsed = time.perf_counter() - start
+
+    verb = "Deleted" if action == "delete" else "Moved"
+    rate = handled / elapsed if elapsed > 0 else 0.0
+    print(f"{verb} {handled} duplicate image(s) ({len(ops)} file operations) in {elapsed:.2f}s ({rate:.0f} images/s)")
+    return handled
 
 
 def handle_duplicates(
@@ -358,14 +1250,43 @@ def handle_duplicates(
     debug: bool,
     duplicate_rules: Optional[List[dict]] = None,
     default_action: str = "move",
-) -> None:
+    index: Optional[DatasetIndex] = None,
+    engine: str = "auto",
+    search: str = "sequential",
+    stats: Optional[dict] = None,
+    workers: int = 0,
+    incremental: bool = False,
+    hash_rule: Optional[ImageHashRule] = None,
+) -> int:
     """
-    Detect and handle duplicate images based on label similarity (class + IoU).
-    No image hash computation - only label file comparison.
+    Detect and handle duplicate images based on label similarity (class + IoU),
+    optionally combined with perceptual image hashes (see hash_rule).
 
     Args:
         duplicate_rules: List of rules for pattern-based duplicate handling.
         default_action: Default action when no rule matches (skip, move, delete).
+        index: Directory index of dataset_base, shared with other startup
+            phases and kept up to date (scanned here when not provided).
+        engine: Label comparator: auto, numpy or python.
+        search: "sequential" compares runs of adjacent files, "global" finds
+            duplicates anywhere in the dataset via a label-signature index.
+        stats: Optional dict filled with the effective "action" and the
+            "images", "groups" and "files" (moved or deleted) counts.
+        workers: Worker processes for the sequential search and for image
+            hashing (0 or 1 = run in this process). Groups are the same
+            either way.
+        incremental: Continue the sequential search from the state saved in
+            .duplicate_state.json by the previous run, comparing only images
+            added after the last scanned filename (plus the base they
+            continue from). Falls back to a full scan when the saved state
+            does not match the folder. Labels edited below the last scanned
+            filename are not compared again, so this is opt-in.
+        hash_rule: Optional image hash rule combined with label similarity
+            (sequential search only). Needs OpenCV; ignored with a warning
+            when it is not installed.
+
+    Returns:
+        int: Number of images analyzed (0 when detection was skipped).
     """
     if duplicate_rules is None:
         duplicate_rules = []
@@ -375,12 +1296,15 @@ def handle_duplicates(
     action = rule["action"]
     labels_limit = rule["labels"]
 
+    if stats is not None:
+        stats.update(action=action, images=0, groups=0, files=0)
+
     print(f"Duplicate handling rule: action={action}, labels={labels_limit}")
 
     # Skip duplicate detection if action is "skip"
     if action == "skip":
         print("Skipping duplicate detection (action=skip)")
-        return
+        return 0
 
     img_dir = os.path.join(dataset_base, "images")
     label_dir = os.path.join(dataset_base, "labels")
@@ -389,28 +1313,91 @@ def handle_duplicates(
 
     if not os.path.isdir(img_dir) or not os.path.isdir(label_dir):
         print("Images or labels directory not found; skipping duplicate detection")
-        return
+        return 0
 
-    image_paths = [
-        os.path.join(img_dir, fname)
-        for fname in sorted(os.listdir(img_dir))
-        if fname.lower().endswith((".jpg", ".jpeg", ".png"))
-    ]
+    if index is None:
+        index = DatasetIndex(dataset_base)
+
+    filenames = index.image_filenames()
 
-    if not image_paths:
+    if not filenames:
         print("No images found; skipping duplicate detection")
-        return
+        return 0
+
+    if search not in DUPLICATE_SEARCH_MODES:
+        raise ValueError(f"Unknown duplicate search mode: {search}")
+
+    if hash_rule is not None and not hashing_available():
+        print("Warning: OpenCV is not installed; image hashing disabled, comparing labels only")
+        hash_rule = None
+    if hash_rule is not None and search != "sequential":
+        print(f"Warning: Image hashing only applies to the sequential search; ignoring it for {search}")
+        hash_rule = None
+    hash_settings = hash_rule.settings() if hash_rule is not None else None
+
+    # Global search looks at every pair of similar images, so it cannot
+    # continue from a saved position
+    track_state = search == "sequential"
+    if track_state and incremental:
+        state = load_duplicate_state(dataset_base)
+        scan_filenames = incremental_filenames(
+            state, filenames, img_dir, iou_threshold, labels_limit, hash_settings
+        )
+        if scan_filenames is not None:
+            if len(scan_filenames) == 1:
+                print(f"No new images after {state['high_water']}; skipping duplicate detection")
+                return 0
+            print(
+                f"Incremental duplicate detection: {len(scan_filenames) - 1} new image(s) "
+                f"after {state['high_water']}, continuing from {scan_filenames[0]}"
+            )
+            filenames = scan_filenames
+
+    image_paths = [os.path.join(img_dir, fname) for fname in filenames]
 
     print(f"Analyzing {len(image_paths)} images for duplicates using IoU threshold {iou_threshold}")
+    if stats is not None:
+        stats["images"] = len(image_paths)
+
+    if hash_rule is not None:
+        hash_rule.load(image_paths, dataset_base, workers)
 
-    groups = find_duplicate_groups(image_paths, iou_threshold, dataset_base, labels_limit)
+    cache = open_label_cache(dataset_base)
+    try:
+        if search == "global":
+            groups = find_duplicate_groups_global(
+                image_paths, iou_threshold, dataset_base, labels_limit, cache=cache, engine=engine
+            )
+        elif workers > 1 and hash_rule is None:
+            groups = find_duplicate_groups_parallel(
+                image_paths, iou_threshold, dataset_base, labels_limit, cache=cache, engine=engine,
+                workers=workers,
+            )
+        else:
+            groups = find_duplicate_groups(
+                image_paths, iou_threshold, dataset_base, labels_limit, cache=cache, engine=engine,
+                hash_rule=hash_rule,
+            )
+    finally:
+        if cache is not None:
+            cache.close()
 
     if not groups:
         print("No duplicates found.")
-        return
+    else:
+        handled = process_duplicates(dataset_base, groups, image_paths, debug, action, index)
+        if stats is not None:
+            stats.update(groups=len(groups), files=handled)
+        print(f"Detected {len(groups)} duplicate group(s).")
 
-    process_duplicates(dataset_base, groups, image_paths, debug, action)
-    print(f"Detected {len(groups)} duplicate group(s).")
+    if track_state:
+        save_duplicate_state(
+            dataset_base,
+            build_duplicate_state(
+                image_paths, groups, iou_threshold, labels_limit, len(index.images), hash_settings
+            ),
+        )
+    return len(image_paths)
 
 
 def find_dataset_roots(root_path: str) -> List[str]:
@@ -458,7 +1445,247 @@ def prompt_debug() -> bool:
     return raw in ("y", "yes")
 
 
-def main() -> None:
+def scan_dataset(
+    dataset_base: str,
+    iou_threshold: float,
+    debug: bool,
+    duplicate_rules: List[dict],
+    default_action: str,
+    engine: str = "auto",
+    search: str = "sequential",
+    workers: int = 0,
+    incremental: bool = False,
+    hash_rule: Optional[ImageHashRule] = None,
+    capture: bool = True,
+) -> dict:
+    """
+    Run handle_duplicates on one dataset. With capture, its output is
+    collected instead of printed, so datasets scanned in parallel do not
+    interleave their logs.
+
+    Returns:
+        dict: dataset, action, images, groups, files, elapsed (seconds),
+        error (None on success) and the captured output ("" without capture).
+    """
+    stats = {"action": default_action, "images": 0, "groups": 0, "files": 0}
+    output = io.StringIO()
+    error = None
+    start = time.perf_counter()
+    redirect = contextlib.redirect_stdout(output) if capture else contextlib.nullcontext()
+    with redirect:
+        try:
+            handle_duplicates(
+                dataset_base,
+                iou_threshold,
+                debug,
+                duplicate_rules=duplicate_rules,
+                default_action=default_action,
+                engine=engine,
+                search=search,
+                stats=stats,
+                workers=workers,
+                incremental=incremental,
+                hash_rule=hash_rule,
+            )
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            traceback.print_exc(file=sys.stdout)
+
+    return {
+        "dataset": dataset_base,
+        **stats,
+        "elapsed": time.perf_counter() - start,
+        "error": error,
+        "output": output.getvalue(),
+    }
+
+
+def scan_datasets(dataset_roots: Sequence[str], jobs: int = 1, **options) -> List[dict]:
+    """
+    Scan every dataset root with scan_dataset, on up to jobs worker processes.
+    With one job the output is printed as it happens; in parallel each
+    dataset's output is printed as one block when it finishes.
+    Returns the results in dataset_roots order.
+    """
+    results = {}
+
+    def report(result: dict) -> None:
+        print(f"\n--- Dataset: {result['dataset']} ---")
+        print(result["output"], end="", flush=True)
+        results[result["dataset"]] = result
+
+    if jobs <= 1 or len(dataset_roots) <= 1:
+        for dataset_base in dataset_roots:
+            print(f"\n--- Dataset: {dataset_base} ---", flush=True)
+            results[dataset_base] = scan_dataset(dataset_base, capture=False, **options)
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(dataset_roots))) as executor:
+            futures = [
+                executor.submit(scan_dataset, dataset_base, **options)
+                for dataset_base in dataset_roots
+            ]
+            for future in as_completed(futures):
+                report(future.result())
+
+    return [results[dataset_base] for dataset_base in dataset_roots]
+
+
+def print_summary(results: Sequence[dict]) -> None:
+    """Print one row per dataset: action, images, groups, files, time, status."""
+    headers = ("Dataset", "Action", "Images", "Groups", "Files", "Seconds", "Status")
+    rows = [
+        (
+            result["dataset"],
+            result["action"],
+            str(result["images"]),
+            str(result["groups"]),
+            str(result["files"]),
+            f"{result['elapsed']:.1f}",
+            "error" if result["error"] else "ok",
+        )
+        for result in results
+    ]
+    rows.append((
+        "Total",
+        "",
+        str(sum(result["images"] for result in results)),
+        str(sum(result["groups"] for result in results)),
+        str(sum(result["files"] for result in results)),
+        f"{sum(result['elapsed'] for result in results):.1f}",
+        f"{sum(1 for result in results if result['error'])} error(s)",
+    ))
+
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+
+    def format_row(row: Sequence[str]) -> str:
+        cells = [
+            cell.ljust(width) if i in (0, 1, 6) else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))
+        ]
+        return "  ".join(cells).rstrip()
+
+    print("\n" + format_row(headers))
+    print("  ".join("-" * width for width in widths))
+    for row in rows[:-1]:
+        print(format_row(row))
+    print("  ".join("-" * width for width in widths))
+    print(format_row(rows[-1]))
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Find and handle duplicate images (label similarity) in every dataset under a root path. "
+        "Prompts for the settings when no root is given."
+    )
+    parser.add_argument(
+        "root",
+        nargs="?",
+        default=None,
+        help="Root path to scan for datasets (folders with images/ and labels/).",
+    )
+    parser.add_argument(
+        "--iou-threshold",
+        type=float,
+        default=0.8,
+        help="IoU threshold for duplicate detection, 0-1 (default: 0.8).",
+    )
+    parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="Place each duplicate group into its own folder under duplicate/images and duplicate/labels.",
+    )
+    parser.add_argument(
+        "--rules",
+        type=str,
+        default=None,
+        help="JSON array of duplicate handling rules (default: DUPLICATE_RULES environment variable).",
+    )
+    parser.add_argument(
+        "--action",
+        type=str,
+        default="move",
+        choices=["skip", "move", "delete"],
+        help="Default action when no rule matches (default: move).",
+    )
+    parser.add_argument(
+        "--similarity-engine",
+        type=str,
+        default="auto",
+        choices=SIMILARITY_ENGINES,
+        help="Label comparator: numpy, python or auto (default: auto).",
+    )
+    parser.add_argument(
+        "--duplicate-search",
+        type=str,
+        default="sequential",
+        choices=DUPLICATE_SEARCH_MODES,
+        help="sequential: compare adjacent files only. global: compare across the whole dataset.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Datasets to scan in parallel worker processes (default: 1).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Worker processes for the sequential search and image hashing inside each dataset "
+        "(default: 0 = single process).",
+    )
+    parser.add_argument(
+        "--image-hash",
+        type=str,
+        default="none",
+        choices=("none",) + HASH_KINDS,
+        help="Also compare perceptual image hashes (needs OpenCV; default: none).",
+    )
+    parser.add_argument(
+        "--hash-rule",
+        type=str,
+        default="and",
+        choices=HASH_RULES,
+        help="and: duplicates must match on labels and image hash. or: either is enough (default: and).",
+    )
+    parser.add_argument(
+        "--hash-distance",
+        type=int,
+        default=DEFAULT_MAX_DISTANCE,
+        help=f"Maximum Hamming distance (of 64 bits) for images to match (default: {DEFAULT_MAX_DISTANCE}).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only scan images added since the last run, continuing from the state in "
+        f"{DUPLICATE_STATE_FILENAME}. Labels edited in already scanned images are not "
+        "compared again (default: scan all images).",
+    )
+    return parser.parse_args(argv)
+
+
+def build_hash_rule(kind: str, rule: str, max_distance: int) -> Optional[ImageHashRule]:
+    """ImageHashRule for the --image-hash/--hash-rule/--hash-distance options, None for "none"."""
+    if kind == "none":
+        return None
+    return ImageHashRule(kind, rule, max_distance)
+
+
+def parse_rules(raw: Optional[str]) -> List[dict]:
+    if not raw:
+        return []
+    try:
+        rules = json.loads(raw)
+    except json.JSONDecodeError as e:
+        print(f"Warning: Failed to parse duplicate rules JSON: {e}")
+        return []
+    if not isinstance(rules, list):
+        print("Warning: duplicate rules must be a list, ignoring")
+        return []
+    return rules
+
+
+def interactive_main() -> None:
     root_path = prompt_path()
     iou_threshold = prompt_iou_threshold(0.8)
     debug = prompt_debug()
@@ -474,5 +1701,44 @@ def main() -> None:
         handle_duplicates(dataset_base, iou_threshold, debug)
 
 
+def main() -> None:
+    args = parse_args()
+
+    if args.root is None:
+        interactive_main()
+        return
+
+    if not os.path.isdir(args.root):
+        print(f"Not a directory: {args.root}")
+        sys.exit(2)
+    iou_threshold = max(0.0, min(1.0, args.iou_threshold))
+    raw_rules = args.rules if args.rules is not None else os.environ.get("DUPLICATE_RULES")
+    duplicate_rules = parse_rules(raw_rules)
+
+    dataset_roots = find_dataset_roots(args.root)
+    if not dataset_roots:
+        print("No datasets found (missing images/ and labels/ folders).")
+        return
+
+    print(f"Found {len(dataset_roots)} dataset(s).")
+    results = scan_datasets(
+        dataset_roots,
+        jobs=args.jobs,
+        iou_threshold=iou_threshold,
+        debug=args.debug,
+        duplicate_rules=duplicate_rules,
+        default_action=args.action,
+        engine=args.similarity_engine,
+        search=args.duplicate_search,
+        workers=args.workers,
+        incremental=args.incremental,
+        hash_rule=build_hash_rule(args.image_hash, args.hash_rule, args.hash_distance),
+    )
+    print_summary(results)
+
+    if any(result["error"] for result in results):
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
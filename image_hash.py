@@ -0,0 +1,243 @@
+"""
+Perceptual image hashes for duplicate detection.
+
+dHash and pHash are computed from a reduced grayscale decode with OpenCV, in
+worker processes, and kept in a SQLite index next to the dataset (in a local
+folder for datasets on network filesystems, see label_cache.dataset_db_path).
+Entries are validated against each image's size and mtime, so later runs only
+hash new or changed images. OpenCV is optional: without it hashing is unavailable and
+duplicate detection falls back to labels only.
+"""
+
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from label_cache import dataset_db_path
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+HASH_KINDS = ("dhash", "phash")
+HASH_RULES = ("and", "or")
+
+HASH_INDEX_FILENAME = ".image_hash_index.sqlite"
+
+# Hamming distance (of 64 bits) up to which two images count as the same
+DEFAULT_MAX_DISTANCE = 6
+
+# Images hashed per worker task
+HASH_CHUNK_SIZE = 64
+
+# (dhash, phash) of one image
+ImageHashes = Tuple[int, int]
+
+
+def hashing_available() -> bool:
+    return cv2 is not None
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def dhash(gray: np.ndarray) -> int:
+    """64-bit difference hash: is each pixel of a 9x8 thumbnail brighter than its left neighbour."""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def phash(gray: np.ndarray) -> int:
+    """64-bit DCT hash: the 8x8 lowest frequencies of a 32x32 thumbnail against their median."""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    coefficients = cv2.dct(small)[:8, :8]
+    median = np.median(coefficients.ravel()[1:])
+    return _bits_to_int(coefficients > median)
+
+
+def compute_hashes(image_path: str) -> Optional[ImageHashes]:
+    """
+    Return (dhash, phash) of an image, or None if it cannot be decoded.
+    JPEGs are decoded at 1/4 scale, which is all the hashes need.
+    """
+    gray = cv2.imread(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if gray is None:
+        gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if gray is None or gray.size == 0:
+        return None
+    return dhash(gray), phash(gray)
+
+
+def _hash_chunk(image_paths: List[str]) -> List[Optional[ImageHashes]]:
+    return [compute_hashes(image_path) for image_path in image_paths]
+
+
+def hamming_distance(hash1: int, hash2: int) -> int:
+    return bin(hash1 ^ hash2).count("1")
+
+
+def _to_hex(value: Optional[int]) -> Optional[str]:
+    return None if value is None else f"{value:016x}"
+
+
+class ImageHashIndex:
+    """
+    SQLite index of image hashes keyed by path and validated against the
+    image's size and mtime. Undecodable images are stored without hashes so
+    they are not retried until the file changes.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Hashes are stored as hex text; SQLite integers are signed 64-bit
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, dhash TEXT, phash TEXT)"
+        )
+
+    def lookup(self, image_path: str, size: int, mtime_ns: int) -> Tuple[bool, Optional[ImageHashes]]:
+        """Return (found, hashes) for an image with the given size and mtime."""
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, dhash, phash FROM hashes WHERE path = ?",
+            (image_path,),
+        ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return False, None
+        if row[2] is None or row[3] is None:
+            return True, None
+        return True, (int(row[2], 16), int(row[3], 16))
+
+    def store(self, entries: Sequence[Tuple[str, int, int, Optional[ImageHashes]]]) -> None:
+        """Store (path, size, mtime_ns, hashes) entries in one transaction."""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO hashes (path, size, mtime_ns, dhash, phash) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (path, size, mtime_ns, _to_hex(hashes and hashes[0]), _to_hex(hashes and hashes[1]))
+                    for path, size, mtime_ns, hashes in entries
+                ],
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def hash_images(
+    image_paths: Sequence[str],
+    dataset_base: str,
+    workers: int = 0,
+) -> Dict[str, Optional[ImageHashes]]:
+    """
+    Return {image path: (dhash, phash) or None} for image_paths, hashing
+    only images missing from (or changed since) the dataset's hash index.
+
+    Args:
+        workers: Worker processes for hashing (0 or 1 = hash in this
+            process), as with --workers.
+    """
+    db_path = dataset_db_path(dataset_base, HASH_INDEX_FILENAME)
+    index = None
+    if db_path is not None:
+        try:
+            index = ImageHashIndex(db_path)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not open image hash index {db_path}: {e}")
+
+    result: Dict[str, Optional[ImageHashes]] = {}
+    missing: List[Tuple[str, int, int]] = []
+    for image_path in image_paths:
+        try:
+            stat = os.stat(image_path)
+        except FileNotFoundError:
+            result[image_path] = None
+            continue
+        if index is not None:
+            found, hashes = index.lookup(image_path, stat.st_size, stat.st_mtime_ns)
+            if found:
+                result[image_path] = hashes
+                continue
+        missing.append((image_path, stat.st_size, stat.st_mtime_ns))
+
+    print(f"Image hashes: {len(result)} from index, {len(missing)} to compute")
+
+    paths = [path for path, _, _ in missing]
+    if workers <= 1 or len(paths) <= HASH_CHUNK_SIZE:
+        computed = _hash_chunk(paths)
+    else:
+        chunks = [paths[i:i + HASH_CHUNK_SIZE] for i in range(0, len(paths), HASH_CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            computed = [hashes for chunk in executor.map(_hash_chunk, chunks) for hashes in chunk]
+
+    for (image_path, _, _), hashes in zip(missing, computed):
+        result[image_path] = hashes
+
+    if index is not None:
+        index.store([entry + (hashes,) for entry, hashes in zip(missing, computed)])
+        index.close()
+
+    failed = sum(1 for hashes in computed if hashes is None)
+    if failed:
+        print(f"Warning: Could not decode {failed} image(s) for hashing")
+    return result
+
+
+class ImageHashRule:
+    """
+    How image hashes combine with label similarity in duplicate detection.
+    Two images look alike when the Hamming distance of their hashes (kind:
+    dhash or phash) is at most max_distance bits. With rule "and" a pair is
+    a duplicate only if labels and images both match; with "or" either one
+    is enough.
+    """
+
+    def __init__(
+        self,
+        kind: str = "dhash",
+        rule: str = "and",
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+    ):
+        if kind not in HASH_KINDS:
+            raise ValueError(f"Unknown image hash: {kind}")
+        if rule not in HASH_RULES:
+            raise ValueError(f"Unknown hash rule: {rule}")
+        self.kind = kind
+        self.rule = rule
+        self.max_distance = max_distance
+        self._hashes: Dict[str, Optional[int]] = {}
+
+    def settings(self) -> list:
+        """Settings that change results, for saved duplicate-scan state."""
+        return [self.kind, self.rule, self.max_distance]
+
+    def load(self, image_paths: Sequence[str], dataset_base: str, workers: int = 0) -> None:
+        """Hash (or look up) every image in image_paths."""
+        position = HASH_KINDS.index(self.kind)
+        self._hashes = {
+            path: None if hashes is None else hashes[position]
+            for path, hashes in hash_images(image_paths, dataset_base, workers).items()
+        }
+
+    def distance(self, image_path1: str, image_path2: str) -> Optional[int]:
+        """Hamming distance of two loaded images, None if either has no hash."""
+        hash1 = self._hashes.get(image_path1)
+        hash2 = self._hashes.get(image_path2)
+        if hash1 is None or hash2 is None:
+            return None
+        return hamming_distance(hash1, hash2)
+
+    def combine(self, labels_match: bool, image_path1: str, image_path2: str) -> bool:
+        """Apply the rule to a label comparison result and the two images' hashes."""
+        if self.rule == "and" and not labels_match:
+            return False
+        if self.rule == "or" and labels_match:
+            return True
+        distance = self.distance(image_path1, image_path2)
+        return distance is not None and distance <= self.max_distance
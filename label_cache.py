@@ -0,0 +1,311 @@
+"""
+Persistent cache of parsed YOLO label files.
+
+Entries are keyed by label path and validated against the file's size and
+mtime, so edited files are re-parsed automatically. Parsed rows are stored as
+packed float64 blobs in a SQLite file next to the dataset (in a local folder
+for datasets on network filesystems), shared by start_fiftyone.py,
+duplicate_finder.py and sync_label.py.
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+from array import array
+from typing import List, Optional, Tuple
+
+# One parsed label line: (class_id, x_center, y_center, width, height) for
+# boxes or (class_id, x1, y1, x2, y2, x3, y3, x4, y4) for OBB lines
+LabelRow = Tuple[float, ...]
+
+CACHE_FILENAME = ".label_cache.sqlite"
+DEFAULT_MAX_ENTRIES = 1_000_000
+
+# Pending writes are committed in batches of this size
+COMMIT_EVERY = 500
+
+# Filesystems whose file locking SQLite cannot rely on (and which lack the
+# shared memory WAL needs); databases of datasets on them are kept locally
+NETWORK_FILESYSTEMS = (
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs", "lustre", "fuse.sshfs",
+)
+
+# Local folder for the databases of datasets on network filesystems
+LOCAL_CACHE_DIR = os.environ.get("LABEL_CACHE_LOCAL_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "fiftyone_label_cache"
+)
+
+
+def parse_label_line(line: str) -> Optional[LabelRow]:
+    """
+    Parse one YOLO label line into a numeric row.
+    Lines with 9+ values keep the 8 OBB coordinates, others keep x/y/w/h.
+    Returns None for lines that are too short or not numeric.
+    """
+    parts = line.strip().split()
+    if len(parts) < 5:
+        return None
+
+    try:
+        head = tuple(float(value) for value in parts[:5])
+    except ValueError:
+        return None
+
+    if not math.isfinite(head[0]):
+        return None
+
+    if len(parts) >= 9:
+        try:
+            return head + tuple(float(value) for value in parts[5:9])
+        except ValueError:
+            pass
+
+    return head
+
+
+def read_label_rows(label_path: str) -> List[LabelRow]:
+    """Read and parse a label file without going through the cache."""
+    if not os.path.exists(label_path):
+        return []
+
+    rows = []
+    with open(label_path, "r", encoding="utf-8") as f:
+        for line in f:
+            row = parse_label_line(line)
+            if row is not None:
+                rows.append(row)
+    return rows
+
+
+def filesystem_type(path: str) -> Optional[str]:
+    """Type of the filesystem holding path, from /proc/mounts (None if unknown)."""
+    path = os.path.realpath(path)
+    best_mount, best_type = "", None
+    try:
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount = parts[1].replace("\\040", " ")
+                inside = path == mount or path.startswith(mount.rstrip("/") + "/")
+                if inside and len(mount) > len(best_mount):
+                    best_mount, best_type = mount, parts[2]
+    except OSError:
+        return None
+    return best_type
+
+
+def dataset_db_path(dataset_base: str, filename: str) -> Optional[str]:
+    """
+    Where a dataset's SQLite file (label cache, image hash index) lives: in
+    the dataset folder, or for datasets on a network filesystem in
+    LOCAL_CACHE_DIR under a name derived from the dataset path, since
+    SQLite's locking is not safe there with several processes writing.
+    Returns None when that local folder cannot be created.
+    """
+    if filesystem_type(dataset_base) not in NETWORK_FILESYSTEMS:
+        return os.path.join(dataset_base, filename)
+
+    digest = hashlib.sha1(os.path.realpath(dataset_base).encode("utf-8")).hexdigest()[:16]
+    try:
+        os.makedirs(LOCAL_CACHE_DIR, exist_ok=True)
+    except OSError as e:
+        print(f"Warning: Could not create local cache folder {LOCAL_CACHE_DIR}: {e}")
+        return None
+    return os.path.join(LOCAL_CACHE_DIR, f"{os.path.basename(dataset_base)}-{digest}{filename}")
+
+
+def encode_rows(rows: List[LabelRow]) -> bytes:
+    values = array("d")
+    for row in rows:
+        values.append(len(row))
+        values.extend(row)
+    return values.tobytes()
+
+
+def decode_rows(blob: bytes) -> List[LabelRow]:
+    values = array("d")
+    values.frombytes(blob)
+    rows = []
+    i = 0
+    while i < len(values):
+        width = int(values[i])
+        rows.append(tuple(values[i + 1:i + 1 + width]))
+        i += 1 + width
+    return rows
+
+
+class LabelCache:
+    """
+    SQLite-backed cache of parsed label rows, safe to share between threads.
+    Each process must open its own instance. If SQLite fails after the cache
+    is open, it warns once and disables itself; files are then parsed
+    directly.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._touched: List[str] = []
+        self.disabled = False
+
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS labels ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "rows BLOB, last_used INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS labels_last_used ON labels (last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+
+        # Every open gets a new generation; entries not used for the most
+        # generations are evicted first once the cache is over its cap
+        with self._conn:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+            self._generation = (row[0] if row else 0) + 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)",
+                (self._generation,),
+            )
+        self._count = self._conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+
+    def get_rows(self, label_path: str) -> List[LabelRow]:
+        """Return parsed rows for label_path, parsing the file only on a cache miss."""
+        try:
+            stat = os.stat(label_path)
+        except FileNotFoundError:
+            return []
+
+        with self._lock:
+            if self.disabled:
+                return read_label_rows(label_path)
+            try:
+                cached = self._conn.execute(
+                    "SELECT size, mtime_ns, rows, last_used FROM labels WHERE path = ?",
+                    (label_path,),
+                ).fetchone()
+            except sqlite3.Error as e:
+                self._disable_locked(e)
+                return read_label_rows(label_path)
+
+        if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            with self._lock:
+                self.hits += 1
+                if cached[3] < self._generation:
+                    self._touched.append(label_path)
+                    self._maybe_flush()
+            return decode_rows(cached[2])
+
+        rows = read_label_rows(label_path)
+        with self._lock:
+            self.misses += 1
+            if self.disabled:
+                return rows
+            if cached is None:
+                self._count += 1
+            self._pending.append(
+                (label_path, stat.st_size, stat.st_mtime_ns, encode_rows(rows), self._generation)
+            )
+            self._maybe_flush()
+        return rows
+
+    def _maybe_flush(self) -> None:
+        if len(self._pending) + len(self._touched) >= COMMIT_EVERY:
+            self._flush_locked()
+
+    def _disable_locked(self, error: sqlite3.Error) -> None:
+        print(f"Warning: Label cache {self.db_path} failed ({error}); parsing label files directly")
+        self.disabled = True
+        self._pending = []
+        self._touched = []
+        try:
+            self._conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _flush_locked(self) -> None:
+        if self.disabled or (not self._pending and not self._touched):
+            return
+
+        try:
+            self._write_locked()
+        except sqlite3.Error as e:
+            self._disable_locked(e)
+            return
+
+        self._pending = []
+        self._touched = []
+
+    def _write_locked(self) -> None:
+        with self._conn:
+            if self._pending:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO labels (path, size, mtime_ns, rows, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    self._pending,
+                )
+            if self._touched:
+                self._conn.executemany(
+                    "UPDATE labels SET last_used = ? WHERE path = ?",
+                    [(self._generation, path) for path in self._touched],
+                )
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM labels WHERE path IN "
+                    "(SELECT path FROM labels ORDER BY last_used ASC LIMIT ?)",
+                    (excess,),
+                )
+                self._count -= excess
+
+    def flush(self) -> None:
+        """Commit pending entries to disk."""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            if not self.disabled:
+                self._conn.close()
+
+
+def open_label_cache(dataset_base: str, max_entries: Optional[int] = None) -> Optional[LabelCache]:
+    """
+    Open the label cache of dataset_base (see dataset_db_path).
+    Returns None when caching is disabled (LABEL_CACHE_DISABLED=true) or the
+    cache file cannot be opened, in which case callers parse files directly.
+    """
+    if os.environ.get("LABEL_CACHE_DISABLED") == "true":
+        return None
+
+    if max_entries is None:
+        try:
+            max_entries = int(os.environ.get("LABEL_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        except ValueError:
+            max_entries = DEFAULT_MAX_ENTRIES
+
+    db_path = dataset_db_path(dataset_base, CACHE_FILENAME)
+    if db_path is None:
+        return None
+    try:
+        return LabelCache(db_path, max_entries)
+    except sqlite3.Error as e:
+        print(f"Warning: Could not open label cache {db_path}: {e}")
+        return None
+
+
+def get_label_rows(label_path: str, cache: Optional[LabelCache] = None) -> List[LabelRow]:
+    """Return parsed rows for label_path, through the cache when one is given."""
+    if cache is None:
+        return read_label_rows(label_path)
+    return cache.get_rows(label_path)
@@ -0,0 +1,385 @@
+"""
+Batched polygon helpers for YOLO labels.
+
+Converts parsed label rows (see label_cache.LabelRow) into closed quadrilaterals
+with NumPy, ordering OBB corners clockwise from the top-left point for a whole
+file, or a whole chunk of files, in one call. Also computes IoU of boxes and of
+rotated quadrilaterals for duplicate detection, batched with NumPy or, for a
+few labels, one pair at a time in plain Python.
+"""
+
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from label_cache import LabelRow
+
+# Polygon corners as [[x, y], ...] lists, ready for fo.Polyline(points=[...])
+Polygon = List[List[float]]
+
+# Corners of one quadrilateral as (x, y) tuples, for the plain-Python helpers
+Quad = List[Tuple[float, float]]
+
+
+def order_quads_clockwise_from_top_left(quads: np.ndarray) -> np.ndarray:
+    """
+    Order the corners of (N, 4, 2) quadrilaterals by descending angle around
+    their centroid, starting from the corner with the smallest y (then x).
+    """
+    quads = np.asarray(quads, dtype=np.float64)
+    if len(quads) == 0:
+        return quads.reshape(0, 4, 2)
+
+    xs = quads[:, :, 0]
+    ys = quads[:, :, 1]
+    cx = (xs[:, 0] + xs[:, 1] + xs[:, 2] + xs[:, 3]) / 4
+    cy = (ys[:, 0] + ys[:, 1] + ys[:, 2] + ys[:, 3]) / 4
+    angles = np.arctan2(ys - cy[:, None], xs - cx[:, None])
+
+    # Stable sort on the negated angle keeps input order for equal angles
+    by_angle = np.argsort(-angles, axis=1, kind="stable")
+    sorted_quads = np.take_along_axis(quads, by_angle[:, :, None], axis=1)
+
+    # First corner (in angle order) with the smallest y, ties broken by x
+    sorted_x = sorted_quads[:, :, 0]
+    sorted_y = sorted_quads[:, :, 1]
+    lowest_y = sorted_y == sorted_y.min(axis=1, keepdims=True)
+    candidate_x = np.where(lowest_y, sorted_x, np.inf)
+    is_start = lowest_y & (candidate_x == candidate_x.min(axis=1, keepdims=True))
+    start = np.argmax(is_start, axis=1)
+
+    rotation = (start[:, None] + np.arange(4)) % 4
+    return np.take_along_axis(sorted_quads, rotation[:, :, None], axis=1)
+
+
+def boxes_to_quads(boxes: np.ndarray) -> np.ndarray:
+    """
+    Convert (N, 4) boxes in (x_center, y_center, width, height) format into
+    (N, 4, 2) corners: top-left, top-right, bottom-right, bottom-left.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    x, y, w, h = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    x_min = x - w / 2
+    x_max = x + w / 2
+    y_min = y - h / 2
+    y_max = y + h / 2
+    return np.stack(
+        [
+            np.stack([x_min, y_min], axis=1),
+            np.stack([x_max, y_min], axis=1),
+            np.stack([x_max, y_max], axis=1),
+            np.stack([x_min, y_max], axis=1),
+        ],
+        axis=1,
+    )
+
+
+def rows_to_quads(rows: Sequence[LabelRow]) -> np.ndarray:
+    """
+    Convert label rows into (N, 4, 2) corners. Rows with 8 coordinates are
+    OBB corners (ordered clockwise from top-left), others are x/y/w/h boxes.
+    """
+    quads = np.empty((len(rows), 4, 2), dtype=np.float64)
+    if not rows:
+        return quads
+
+    is_obb = np.fromiter((len(row) >= 9 for row in rows), dtype=bool, count=len(rows))
+    if is_obb.any():
+        obb = np.array([row[1:9] for row in rows if len(row) >= 9], dtype=np.float64)
+        quads[is_obb] = order_quads_clockwise_from_top_left(obb.reshape(-1, 4, 2))
+    if not is_obb.all():
+        boxes = np.array([row[1:5] for row in rows if len(row) < 9], dtype=np.float64)
+        quads[~is_obb] = boxes_to_quads(boxes)
+    return quads
+
+
+def polygons_for_files(rows_per_file: Sequence[Sequence[LabelRow]]) -> List[List[Polygon]]:
+    """
+    Convert the label rows of many files in a single batch.
+    Returns one list of polygons per file, in row order.
+    """
+    flat_rows = [row for rows in rows_per_file for row in rows]
+    polygons = rows_to_quads(flat_rows).tolist()
+
+    result = []
+    offset = 0
+    for rows in rows_per_file:
+        result.append(polygons[offset:offset + len(rows)])
+        offset += len(rows)
+    return result
+
+
+def rows_to_polygons(rows: Sequence[LabelRow]) -> List[Polygon]:
+    """Convert the label rows of one file into polygons, in row order."""
+    return rows_to_quads(rows).tolist()
+
+
+def box_iou_matrix(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    IoU of every pair of (x_center, y_center, width, height) boxes as an
+    (N, M) matrix. Uses the same arithmetic as duplicate_finder.calculate_iou
+    so results match it exactly for finite boxes; pairs with an empty union
+    get 0.
+    """
+    boxes1 = np.asarray(boxes1, dtype=np.float64).reshape(-1, 4)
+    boxes2 = np.asarray(boxes2, dtype=np.float64).reshape(-1, 4)
+
+    x1, y1, w1, h1 = (boxes1[:, i, None] for i in range(4))
+    x2, y2, w2, h2 = (boxes2[None, :, i] for i in range(4))
+
+    inter_x_min = np.maximum(x1 - w1 / 2, x2 - w2 / 2)
+    inter_y_min = np.maximum(y1 - h1 / 2, y2 - h2 / 2)
+    inter_x_max = np.minimum(x1 + w1 / 2, x2 + w2 / 2)
+    inter_y_max = np.minimum(y1 + h1 / 2, y2 + h2 / 2)
+
+    inter_width = np.maximum(0.0, inter_x_max - inter_x_min)
+    inter_height = np.maximum(0.0, inter_y_max - inter_y_min)
+    inter_area = inter_width * inter_height
+    union_area = w1 * h1 + w2 * h2 - inter_area
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        iou = inter_area / union_area
+    return np.where(union_area == 0, 0.0, iou)
+
+
+def polygon_areas(xs: np.ndarray, ys: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Areas of polygons given as (P, V) vertex coordinates, of which the first
+    counts[p] are valid (shoelace formula, orientation ignored). Polygons
+    with fewer than three vertices have area 0.
+    """
+    rows = np.arange(len(xs))[:, None]
+    vertex = np.arange(xs.shape[1])[None, :]
+    following = (vertex + 1) % np.maximum(counts, 1)[:, None]
+    cross = xs * ys[rows, following] - xs[rows, following] * ys
+    areas = np.abs(np.where(vertex < counts[:, None], cross, 0.0).sum(axis=1)) / 2
+    return np.where(counts >= 3, areas, 0.0)
+
+
+_NEXT_CORNER = [1, 2, 3, 0]
+
+
+def quad_areas(quads: np.ndarray) -> np.ndarray:
+    """Signed areas of (P, 4, 2) quads, positive for counter-clockwise corners."""
+    xs = quads[:, :, 0]
+    ys = quads[:, :, 1]
+    return (xs * ys[:, _NEXT_CORNER] - xs[:, _NEXT_CORNER] * ys).sum(axis=1) / 2
+
+
+def clip_quads(
+    subjects: np.ndarray,
+    clips: np.ndarray,
+    clip_areas: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sutherland-Hodgman clipping of P subject quads by P convex clip quads,
+    pair by pair, with all pairs processed together. Both are (P, 4, 2).
+    Returns (xs, ys, counts): (P, V) vertex coordinates where the first
+    counts[p] form the intersection polygon of pair p.
+
+    Args:
+        clip_areas: Signed areas of clips (see quad_areas), if already known.
+    """
+    pairs = len(subjects)
+    rows = np.arange(pairs)[:, None]
+    xs = subjects[:, :, 0]
+    ys = subjects[:, :, 1]
+    counts = np.full(pairs, 4)
+
+    # Inside is the left of each clip edge for counter-clockwise clip quads;
+    # flip the test for clockwise ones
+    if clip_areas is None:
+        clip_areas = quad_areas(clips)
+    orientation = np.where(clip_areas < 0, -1.0, 1.0)[:, None]
+
+    for edge in range(4):
+        if xs.shape[1] == 0:
+            break
+        start_x = clips[:, edge, 0, None]
+        start_y = clips[:, edge, 1, None]
+        dir_x = (clips[:, (edge + 1) % 4, 0, None] - start_x) * orientation
+        dir_y = (clips[:, (edge + 1) % 4, 1, None] - start_y) * orientation
+
+        vertex = np.arange(xs.shape[1])[None, :]
+        valid = vertex < counts[:, None]
+        following = (vertex + 1) % np.maximum(counts, 1)[:, None]
+        next_xs = xs[rows, following]
+        next_ys = ys[rows, following]
+
+        side = dir_x * (ys - start_y) - dir_y * (xs - start_x)
+        next_side = dir_x * (next_ys - start_y) - dir_y * (next_xs - start_x)
+        next_inside = next_side >= 0
+        crossing = valid & ((side >= 0) != next_inside)
+
+        denominator = np.where(crossing, side - next_side, 1.0)
+        t = np.where(crossing, side / denominator, 0.0)
+
+        # Each edge vertex -> next emits its crossing point, then next if inside
+        width = 2 * xs.shape[1]
+        candidate_xs = np.empty((pairs, width))
+        candidate_ys = np.empty((pairs, width))
+        keep = np.empty((pairs, width), dtype=bool)
+        candidate_xs[:, 0::2] = xs + t * (next_xs - xs)
+        candidate_xs[:, 1::2] = next_xs
+        candidate_ys[:, 0::2] = ys + t * (next_ys - ys)
+        candidate_ys[:, 1::2] = next_ys
+        keep[:, 0::2] = crossing
+        keep[:, 1::2] = valid & next_inside
+
+        counts = keep.sum(axis=1)
+        order = np.argsort(~keep, axis=1, kind="stable")[:, :counts.max(initial=0)]
+        xs = candidate_xs[rows, order]
+        ys = candidate_ys[rows, order]
+
+    return xs, ys, counts
+
+
+def _quad_iou(quads1: np.ndarray, quads2: np.ndarray, areas1: np.ndarray, areas2: np.ndarray) -> np.ndarray:
+    if len(quads1) == 0:
+        return np.zeros(0)
+    xs, ys, counts = clip_quads(quads1, quads2, areas2)
+    inter_area = polygon_areas(xs, ys, counts)
+    union_area = np.abs(areas1) + np.abs(areas2) - inter_area
+    positive = union_area > 0
+    return np.where(positive, inter_area / np.where(positive, union_area, 1.0), 0.0)
+
+
+def quad_iou_pairs(quads1: np.ndarray, quads2: np.ndarray) -> np.ndarray:
+    """
+    IoU of quads1[p] and quads2[p] for every p, both (P, 4, 2) convex
+    quadrilaterals (OBB corners, either orientation). Pairs with an empty
+    union get 0.
+    """
+    quads1 = np.asarray(quads1, dtype=np.float64).reshape(-1, 4, 2)
+    quads2 = np.asarray(quads2, dtype=np.float64).reshape(-1, 4, 2)
+    return _quad_iou(quads1, quads2, quad_areas(quads1), quad_areas(quads2))
+
+
+def quad_iou_matrix(
+    quads1: np.ndarray,
+    quads2: np.ndarray,
+    pair_mask: Optional[np.ndarray] = None,
+    min_iou: float = 0.0,
+) -> np.ndarray:
+    """
+    IoU of every pair of (N, 4, 2) and (M, 4, 2) convex quads as an (N, M)
+    matrix. Only pairs whose axis-aligned extents overlap are clipped, the
+    others are 0.
+
+    Args:
+        pair_mask: Optional (N, M) bool mask of the pairs to compute; the
+            other entries are left at 0.
+        min_iou: Also leave at 0 the pairs whose IoU cannot reach min_iou
+            by iou_upper_bound.
+    """
+    quads1 = np.asarray(quads1, dtype=np.float64).reshape(-1, 4, 2)
+    quads2 = np.asarray(quads2, dtype=np.float64).reshape(-1, 4, 2)
+    low1, high1 = quads1.min(axis=1), quads1.max(axis=1)
+    low2, high2 = quads2.min(axis=1), quads2.max(axis=1)
+    overlap = (
+        (low1[:, None, :] < high2[None, :, :]) & (low2[None, :, :] < high1[:, None, :])
+    ).all(axis=2)
+    if pair_mask is not None:
+        overlap &= pair_mask
+
+    areas1 = quad_areas(quads1)
+    areas2 = quad_areas(quads2)
+    if min_iou > 0:
+        extent = np.minimum(high1[:, None, :], high2[None, :, :]) - np.maximum(low1[:, None, :], low2[None, :, :])
+        overlap &= iou_upper_bound(
+            extent[:, :, 0] * extent[:, :, 1], np.abs(areas1)[:, None], np.abs(areas2)[None, :]
+        ) >= min_iou
+
+    iou = np.zeros((len(quads1), len(quads2)))
+    rows, cols = np.nonzero(overlap)
+    iou[rows, cols] = _quad_iou(quads1[rows], quads2[cols], areas1[rows], areas2[cols])
+    return iou
+
+
+def iou_upper_bound(extent_overlap, area1, area2):
+    """
+    Upper bound on the IoU of two polygons from the overlap area of their
+    axis-aligned extents and their own areas: the intersection is at most
+    the smallest of the three. Works on floats and NumPy arrays alike.
+    """
+    if isinstance(extent_overlap, np.ndarray):
+        intersection = np.minimum(extent_overlap, np.minimum(area1, area2))
+        union = area1 + area2 - intersection
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(union > 0, intersection / union, 0.0)
+    intersection = min(extent_overlap, area1, area2)
+    union = area1 + area2 - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def row_to_quad(row: LabelRow) -> Quad:
+    """rows_to_quads for a single row, as (x, y) tuples in plain Python."""
+    if len(row) < 9:
+        x, y, w, h = row[1:5]
+        x_min = x - w / 2
+        x_max = x + w / 2
+        y_min = y - h / 2
+        y_max = y + h / 2
+        return [(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)]
+
+    corners = [(row[1 + 2 * k], row[2 + 2 * k]) for k in range(4)]
+    cx = (corners[0][0] + corners[1][0] + corners[2][0] + corners[3][0]) / 4
+    cy = (corners[0][1] + corners[1][1] + corners[2][1] + corners[3][1]) / 4
+    # Any cyclic order of a convex quad gives the same areas and IoU, so
+    # the rotation to the top-left corner is skipped here
+    return sorted(corners, key=lambda corner: -math.atan2(corner[1] - cy, corner[0] - cx))
+
+
+def polygon_area(polygon: Sequence[Tuple[float, float]]) -> float:
+    """Signed shoelace area of one polygon, positive for counter-clockwise corners."""
+    count = len(polygon)
+    if count < 3:
+        return 0.0
+    twice_area = 0.0
+    for k in range(count):
+        x, y = polygon[k]
+        next_x, next_y = polygon[(k + 1) % count]
+        twice_area += x * next_y - next_x * y
+    return twice_area / 2
+
+
+def clip_quad(subject: Quad, clip: Quad, clip_area: float) -> List[Tuple[float, float]]:
+    """
+    clip_quads for a single pair in plain Python: the intersection polygon
+    of subject and the convex quad clip, whose signed area is clip_area.
+    """
+    orientation = -1.0 if clip_area < 0 else 1.0
+    polygon = list(subject)
+    for edge in range(4):
+        if not polygon:
+            break
+        start_x, start_y = clip[edge]
+        dir_x = (clip[(edge + 1) % 4][0] - start_x) * orientation
+        dir_y = (clip[(edge + 1) % 4][1] - start_y) * orientation
+
+        clipped = []
+        count = len(polygon)
+        for k in range(count):
+            x, y = polygon[k]
+            next_x, next_y = polygon[(k + 1) % count]
+            side = dir_x * (y - start_y) - dir_y * (x - start_x)
+            next_side = dir_x * (next_y - start_y) - dir_y * (next_x - start_x)
+            next_inside = next_side >= 0
+            if (side >= 0) != next_inside:
+                t = side / (side - next_side)
+                clipped.append((x + t * (next_x - x), y + t * (next_y - y)))
+            if next_inside:
+                clipped.append((next_x, next_y))
+        polygon = clipped
+    return polygon
+
+
+def quad_iou(quad1: Quad, quad2: Quad, area1: float, area2: float) -> float:
+    """
+    IoU of two convex quads with signed areas area1 and area2, in plain
+    Python (quad_iou_pairs for a single pair, without NumPy's per-call cost).
+    """
+    inter_area = abs(polygon_area(clip_quad(quad1, quad2, area2)))
+    union_area = abs(area1) + abs(area2) - inter_area
+    return inter_area / union_area if union_area > 0 else 0.0
@@ -2,7 +2,8 @@ import fs from 'fs';
 import path from 'path';
 import http from 'http';
 import os from 'os';
-import { exec, execFile } from 'child_process';
+import net from 'net';
+import { exec, execFile, spawn } from 'child_process';
 import util from 'util';
 
 export const execPromise = util.promisify(exec);
@@ -121,6 +122,92 @@ export function resolveImagePath(instance, relativeLabelPath, fullLabelPath) {
   return '';
 }
 
+// Datasets whose label sync server was started by this process and is still running
+const labelSyncServers = new Set();
+
+export function getLabelSyncSocketPath(datasetName) {
+  const socketDir = process.env.LABEL_SYNC_SOCKET_DIR || os.tmpdir();
+  return path.join(socketDir, `fiftyone_label_sync_${datasetName}.sock`);
+}
+
+// Send one request to a running `sync_label.py --serve`; rejects if none is listening
+function sendLabelSyncRequest(socketPath, request) {
+  return new Promise((resolve, reject) => {
+    const client = net.createConnection(socketPath);
+    let buffer = '';
+    let settled = false;
+    const finish = (err, response) => {
+      if (settled) {
+        return;
+      }
+      settled = true;
+      client.destroy();
+      if (err) {
+        reject(err);
+      } else {
+        resolve(response);
+      }
+    };
+
+    client.setTimeout(30000, () => finish(new Error('Label sync server timed out')));
+    client.on('connect', () => {
+      client.write(`${JSON.stringify(request)}\n`);
+    });
+    client.on('data', (chunk) => {
+      buffer += chunk.toString();
+      const newline = buffer.indexOf('\n');
+      if (newline !== -1) {
+        try {
+          finish(null, JSON.parse(buffer.slice(0, newline)));
+        } catch (err) {
+          finish(err);
+        }
+      }
+    });
+    client.on('error', (err) => finish(err));
+    client.on('close', () => finish(new Error('Label sync server closed the connection')));
+  });
+}
+
+function startLabelSyncServer(pythonPath, scriptPath, datasetName, env) {
+  if (labelSyncServers.has(datasetName)) {
+    return;
+  }
+  labelSyncServers.add(datasetName);
+
+  const args = [scriptPath, '--serve', '--dataset-name', datasetName];
+  if (process.env.LABEL_SYNC_DEBOUNCE_MS) {
+    args.push('--debounce-ms', process.env.LABEL_SYNC_DEBOUNCE_MS);
+  }
+
+  const child = spawn(pythonPath, args, {
+    env,
+    detached: true,
+    stdio: 'ignore'
+  });
+  child.on('error', (err) => {
+    console.warn(`Label sync server failed to start: ${err.message}`);
+    labelSyncServers.delete(datasetName);
+  });
+  child.on('exit', () => labelSyncServers.delete(datasetName));
+  child.unref();
+}
+
+function runLabelSyncProcess(pythonPath, scriptPath, args, env) {
+  execFile(pythonPath, [scriptPath, ...args], { env }, (err, stdout, stderr) => {
+    if (err) {
+      console.warn(`Label sync skipped: ${err.message}`);
+      if (process.env.LABEL_SYNC_VERBOSE === 'true' && stderr) {
+        console.warn(stderr.toString());
+      }
+      return;
+    }
+    if (process.env.LABEL_SYNC_VERBOSE === 'true' && stdout) {
+      console.log(stdout.toString().trim());
+    }
+  });
+}
+
 export function triggerLabelSync(instance, imagePath, labelPath) {
   if (!instance || !imagePath || !labelPath) {
     return;
@@ -139,7 +226,6 @@ export function triggerLabelSync(instance, imagePath, labelPath) {
   };
 
   const args = [
-    scriptPath,
     '--dataset-name',
     datasetName,
     '--image-path',
@@ -151,18 +237,74 @@ export function triggerLabelSync(instance, imagePath, labelPath) {
     args.push('--class-file', instance.classFile);
   }
 
-  execFile(pythonPath, args, { env }, (err, stdout, stderr) => {
+  if (process.env.LABEL_SYNC_SERVER_DISABLED === 'true') {
+    runLabelSyncProcess(pythonPath, scriptPath, args, env);
+    return;
+  }
+
+  // Prefer the long-lived server; until it is up, sync with a one-off process
+  const request = {
+    dataset_name: datasetName,
+    image_path: imagePath,
+    label_path: labelPath,
+    class_file: instance.classFile || ''
+  };
+  sendLabelSyncRequest(getLabelSyncSocketPath(datasetName), request)
+    .then((response) => {
+      if (!response.ok) {
+        console.warn(`Label sync skipped: ${response.error}`);
+      } else if (process.env.LABEL_SYNC_VERBOSE === 'true') {
+        console.log(`Label sync ${response.queued ? 'queued' : 'done'} in ${response.elapsed_ms} ms`);
+      }
+    })
+    .catch(() => {
+      runLabelSyncProcess(pythonPath, scriptPath, args, env);
+      startLabelSyncServer(pythonPath, scriptPath, datasetName, env);
+    });
+}
+
+// Sync many labels with one `sync_label.py --batch` process (pairs are streamed on stdin)
+export function triggerBatchLabelSync(instance, pairs) {
+  if (!instance || !pairs || pairs.length === 0) {
+    return;
+  }
+  if (process.env.LABEL_SYNC_DISABLED === 'true') {
+    return;
+  }
+
+  const pythonPath = getPythonBin();
+  const scriptPath = path.join(process.cwd(), 'sync_label.py');
+  const datasetName = getInstanceDbName(instance);
+  const env = {
+    ...process.env,
+    FIFTYONE_DATABASE_URI: process.env.FIFTYONE_DATABASE_URI || 'mongodb://mongodb:27017',
+    FIFTYONE_DATABASE_NAME: datasetName
+  };
+
+  const args = [scriptPath, '--dataset-name', datasetName, '--batch'];
+  if (instance.classFile) {
+    args.push('--class-file', instance.classFile);
+  }
+
+  const child = execFile(pythonPath, args, { env, maxBuffer: 10 * 1024 * 1024 }, (err, stdout, stderr) => {
     if (err) {
-      console.warn(`Label sync skipped: ${err.message}`);
+      console.warn(`Batch label sync failed: ${err.message}`);
       if (process.env.LABEL_SYNC_VERBOSE === 'true' && stderr) {
         console.warn(stderr.toString());
       }
       return;
     }
-    if (process.env.LABEL_SYNC_VERBOSE === 'true' && stdout) {
+    if (stdout) {
       console.log(stdout.toString().trim());
     }
   });
+  child.stdin.on('error', (err) => console.warn(`Batch label sync input failed: ${err.message}`));
+  child.stdin.end(
+    pairs
+      .map(({ imagePath, labelPath }) =>
+        JSON.stringify({ image_path: imagePath, label_path: labelPath }))
+      .join('\n') + '\n'
+  );
 }
 
 export function getPythonBin() {
@@ -410,6 +552,7 @@ export async function convertDatasetToPentagonFormat(datasetPath) {
   }
 
   const labelFiles = fs.readdirSync(labelsDir).filter((file) => file.endsWith('.txt'));
+  const convertedFiles = [];
   let convertedCount = 0;
   let alreadyPentagonCount = 0;
   let errorCount = 0;
@@ -459,6 +602,7 @@ export async function convertDatasetToPentagonFormat(datasetPath) {
       });
 
       fs.writeFileSync(labelPath, `${convertedLines.join('\n')}\n`, 'utf8');
+      convertedFiles.push(labelPath);
       convertedCount += 1;
     } catch (err) {
       console.error(`Error converting ${labelFile}:`, err.message);
@@ -466,7 +610,13 @@ export async function convertDatasetToPentagonFormat(datasetPath) {
     }
   }
 
-  return { convertedCount, alreadyPentagonCount, errorCount, totalFiles: labelFiles.length };
+  return {
+    convertedCount,
+    alreadyPentagonCount,
+    errorCount,
+    totalFiles: labelFiles.length,
+    convertedFiles
+  };
 }
 
 export async function checkDatasetFormat(datasetPath) {
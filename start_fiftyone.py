@@ -2,15 +2,30 @@ import argparse
 import json
 import os
 import logging
-import math
+import resource
 import sys
-from collections import defaultdict
-from typing import List, Tuple, Sequence, Optional
-from datetime import datetime
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Set, Tuple, Sequence, Optional
+from datetime import datetime, timezone
 
 import fiftyone as fo
+from fiftyone import ViewField as F
+from bson import ObjectId
 from pymongo import MongoClient
 
+from dataset_index import IMAGE_EXTENSIONS, DatasetIndex
+from dataset_watcher import DEFAULT_MAX_BATCH_SECONDS, FileChange, iter_change_batches, open_watcher
+from duplicate_finder import DUPLICATE_SEARCH_MODES, SIMILARITY_ENGINES, build_hash_rule, handle_duplicates
+from image_hash import DEFAULT_MAX_DISTANCE, HASH_KINDS, HASH_RULES
+from label_cache import LabelCache, LabelRow, get_label_rows, open_label_cache
+from label_geometry import Polygon, polygons_for_files
+from sync_label import sync_batch
+
 # Reduce FiftyOne logging verbosity to prevent PM2 log overflow
 logging.getLogger("fiftyone").setLevel(logging.WARNING)
 logging.getLogger("eta").setLevel(logging.WARNING)
@@ -18,51 +33,38 @@ logging.getLogger("eta").setLevel(logging.WARNING)
 fo.config.show_progress_bars = True
 
 # ----------------------------------------------------------------------
-# Duplicate detection helpers (label-based, no image hashing)
+# Dataset cleanup helpers (duplicate detection lives in duplicate_finder.py)
 # ----------------------------------------------------------------------
 
 
-def unique_target_path(img_dir: str, label_dir: str, filename: str) -> Tuple[str, str]:
-    """Return paths for image and label with a collision-safe name."""
-    name, ext = os.path.splitext(filename)
-    candidate_name = filename
-    idx = 1
-    while True:
-        img_target = os.path.join(img_dir, candidate_name)
-        label_target = os.path.join(label_dir, os.path.splitext(candidate_name)[0] + ".txt")
-        if not os.path.exists(img_target) and not os.path.exists(label_target):
-            return img_target, label_target
-        candidate_name = f"{name}_dup{idx}{ext}"
-        idx += 1
-
-
-def remove_orphaned_labels(dataset_base: str) -> int:
+def remove_orphaned_labels(dataset_base: str, index: Optional[DatasetIndex] = None) -> int:
     """
     Remove label .txt files that have no corresponding image file.
     Returns the number of removed files.
+
+    Args:
+        index: Directory index of dataset_base; updated as labels are removed
+            (scanned here when not provided).
     """
-    img_dir = os.path.join(dataset_base, "images")
     label_dir = os.path.join(dataset_base, "labels")
 
     if not os.path.isdir(label_dir):
         return 0
 
-    image_extensions = (".jpg", ".jpeg", ".png")
+    if index is None:
+        index = DatasetIndex(dataset_base)
+
     removed = 0
 
-    for txt_file in os.listdir(label_dir):
+    for txt_file in sorted(index.labels):
         if not txt_file.lower().endswith(".txt"):
             continue
 
         stem = os.path.splitext(txt_file)[0]
-        has_image = any(
-            os.path.exists(os.path.join(img_dir, stem + ext))
-            for ext in image_extensions
-        )
-
-        if not has_image:
+        if not index.has_image_for_stem(stem):
             txt_path = os.path.join(label_dir, txt_file)
             os.remove(txt_path)
+            index.discard_label(txt_file)
             print(f"Removed orphaned label: {txt_path}")
             removed += 1
 
@@ -71,445 +73,976 @@ def remove_orphaned_labels(dataset_base: str) -> int:
     return removed
 
 
-def get_label_path(image_path: str) -> str:
-    """Convert image path to corresponding label path."""
-    label_path = image_path.replace("images", "labels")
-    label_path = label_path.replace("jpg", "txt")
-    label_path = label_path.replace("jpeg", "txt")
-    label_path = label_path.replace("png", "txt")
-    return label_path
+# ----------------------------------------------------------------------
+# Label ingest helpers (optionally parallel across a process pool)
+# ----------------------------------------------------------------------
 
+# Compact, picklable form of one label line: (label, polygon points)
+LabelRecord = Tuple[str, Polygon]
 
-def parse_yolo_labels(image_path: str) -> List[Tuple[int, float, float, float, float]]:
-    """
-    Parse YOLO format labels from file.
-    Returns list of (class_id, x_center, y_center, width, height).
-    All coordinates are normalized [0, 1].
-    """
-    label_path = get_label_path(image_path)
+# Number of label files handed to a pool worker per task
+INGEST_CHUNK_SIZE = 256
 
-    if not os.path.exists(label_path):
-        return []
 
-    labels = []
-    with open(label_path, "r", encoding="utf-8") as f:
-        for line in f:
-            parts = line.strip().split()
-            if len(parts) < 5:
-                continue
+def label_records_for_files(
+    rows_per_file: Sequence[Sequence[LabelRow]],
+    names: Sequence[str],
+) -> List[List[LabelRecord]]:
+    """
+    Convert the parsed label rows of many files into (label, points) records,
+    building all polygons of the batch in one vectorized call.
+    """
+    polygons_per_file = polygons_for_files(rows_per_file)
+
+    records_per_file = []
+    for rows, polygons in zip(rows_per_file, polygons_per_file):
+        records = []
+        for row, points in zip(rows, polygons):
+            cls_idx = int(row[0])
+            # Handle class indices beyond the hardcoded names list
+            if cls_idx < len(names):
+                label = names[cls_idx]
+            else:
+                label = f"class_{cls_idx}"
+            records.append((label, points))
+        records_per_file.append(records)
 
-            try:
-                class_id = int(float(parts[0]))
-                x_center = float(parts[1])
-                y_center = float(parts[2])
-                width = float(parts[3])
-                height = float(parts[4])
-                labels.append((class_id, x_center, y_center, width, height))
-            except (ValueError, IndexError):
-                continue
+    return records_per_file
 
-    return labels
 
+def parse_label_chunk(
+    txt_paths: Sequence[str],
+    names: Sequence[str],
+    cache: Optional[LabelCache] = None,
+) -> List[List[LabelRecord]]:
+    """Parse a chunk of YOLO label files into one record list per file."""
+    rows_per_file = [get_label_rows(txt_path, cache) for txt_path in txt_paths]
+    return label_records_for_files(rows_per_file, names)
 
-def order_points_clockwise_from_top_left(points: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
-    cx = sum(p[0] for p in points) / len(points)
-    cy = sum(p[1] for p in points) / len(points)
 
-    with_angle = []
-    for x, y in points:
-        angle = math.atan2(y - cy, x - cx)
-        with_angle.append((x, y, angle))
+_worker_names: Sequence[str] = ()
+_worker_cache: Optional[LabelCache] = None
 
-    with_angle.sort(key=lambda p: p[2], reverse=True)
 
-    start_idx = 0
-    for i in range(1, len(with_angle)):
-        y = with_angle[i][1]
-        x = with_angle[i][0]
-        y0 = with_angle[start_idx][1]
-        x0 = with_angle[start_idx][0]
-        if y < y0 or (y == y0 and x < x0):
-            start_idx = i
+def _init_ingest_worker(names: Sequence[str], cache_path: Optional[str], cache_max_entries: int) -> None:
+    global _worker_names, _worker_cache
+    _worker_names = names
+    if cache_path:
+        _worker_cache = LabelCache(cache_path, cache_max_entries)
 
-    ordered = []
-    for i in range(len(with_angle)):
-        idx = (start_idx + i) % len(with_angle)
-        ordered.append((with_angle[idx][0], with_angle[idx][1]))
 
-    return ordered
+def _parse_label_chunk(txt_paths: List[str]) -> List[List[LabelRecord]]:
+    records = parse_label_chunk(txt_paths, _worker_names, _worker_cache)
+    if _worker_cache is not None:
+        _worker_cache.flush()
+    return records
 
 
-def calculate_iou(box1: Tuple[float, float, float, float],
-                  box2: Tuple[float, float, float, float]) -> float:
-    """
-    Calculate IoU (Intersection over Union) between two bounding boxes.
-    Boxes are in format (x_center, y_center, width, height) normalized [0, 1].
+def iter_label_records(
+    txt_paths: Sequence[str],
+    names: Sequence[str],
+    workers: int = 0,
+    cache: Optional[LabelCache] = None,
+) -> Iterator[List[LabelRecord]]:
     """
-    # Convert from center format to corner format
-    x1_min = box1[0] - box1[2] / 2
-    y1_min = box1[1] - box1[3] / 2
-    x1_max = box1[0] + box1[2] / 2
-    y1_max = box1[1] + box1[3] / 2
-
-    x2_min = box2[0] - box2[2] / 2
-    y2_min = box2[1] - box2[3] / 2
-    x2_max = box2[0] + box2[2] / 2
-    y2_max = box2[1] + box2[3] / 2
+    Yield one record list per label path, in the same order as txt_paths.
 
-    # Calculate intersection
-    inter_x_min = max(x1_min, x2_min)
-    inter_y_min = max(y1_min, y2_min)
-    inter_x_max = min(x1_max, x2_max)
-    inter_y_max = min(y1_max, y2_max)
+    Args:
+        workers: Number of worker processes (0 or 1 = parse in this process).
+            Only a few chunks per worker are in flight at any time.
+        cache: Optional parsed-label cache; pool workers open their own
+            connection to the same cache file.
+    """
+    if workers <= 1 or len(txt_paths) <= INGEST_CHUNK_SIZE:
+        for i in range(0, len(txt_paths), INGEST_CHUNK_SIZE):
+            yield from parse_label_chunk(txt_paths[i:i + INGEST_CHUNK_SIZE], names, cache)
+        return
 
-    inter_width = max(0.0, inter_x_max - inter_x_min)
-    inter_height = max(0.0, inter_y_max - inter_y_min)
-    inter_area = inter_width * inter_height
+    print(f"Parsing {len(txt_paths)} label files with {workers} worker processes")
 
-    # Calculate union
-    box1_area = box1[2] * box1[3]
-    box2_area = box2[2] * box2[3]
-    union_area = box1_area + box2_area - inter_area
+    if cache is not None:
+        cache.flush()
+        cache_args = (cache.db_path, cache.max_entries)
+    else:
+        cache_args = (None, 0)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_ingest_worker,
+        initargs=(list(names),) + cache_args,
+    ) as executor:
+        pending: Deque[Future] = deque()
+        for i in range(0, len(txt_paths), INGEST_CHUNK_SIZE):
+            chunk = list(txt_paths[i:i + INGEST_CHUNK_SIZE])
+            pending.append(executor.submit(_parse_label_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def build_polylines(records: Sequence[LabelRecord]) -> fo.Polylines:
+    """Assemble the ground_truth label from parsed label records."""
+    polylines = [
+        fo.Polyline(
+            label=label,
+            points=[points],
+            closed=True,
+            filled=False,
+        )
+        for label, points in records
+    ]
+    return fo.Polylines(polylines=polylines)
 
-    # Avoid division by zero
-    if union_area == 0:
-        return 0.0
 
-    return inter_area / union_area
+def build_sample(img_path: str, fname: str, records: Sequence[LabelRecord]) -> fo.Sample:
+    """Assemble a FiftyOne sample from parsed label records."""
+    sample = fo.Sample(filepath=img_path)
+    sample["filename"] = fname
+    sample["ground_truth"] = build_polylines(records)
+    return sample
 
 
-def labels_are_similar(labels1: List[Tuple[int, float, float, float, float]],
-                       labels2: List[Tuple[int, float, float, float, float]],
-                       iou_threshold: float,
-                       labels_limit: int = 0) -> bool:
+def iter_labeled_entries(
+    label_entries: Sequence[Tuple[str, str]],
+    names: Sequence[str],
+    workers: int = 0,
+    cache: Optional[LabelCache] = None,
+) -> Iterator[Tuple[int, str, List[LabelRecord]]]:
     """
-    Check if two label sets are similar based on class matching and IoU threshold.
-    For multiple boxes of the same class, finds optimal matching using greedy algorithm.
-    Returns True if both have same number of boxes, all classes match, and all IoUs exceed threshold.
+    Yield (filename_order, image filename, records) for (image filename,
+    label path) entries already sorted by filename.
+    """
+    txt_paths = [txt_path for _fname, txt_path in label_entries]
+    records_iter = iter_label_records(txt_paths, names, workers, cache)
+    for order, ((fname, _txt_path), records) in enumerate(zip(label_entries, records_iter)):
+        yield order, fname, records
+
+
+def iter_samples(
+    img_dir: str,
+    label_entries: Sequence[Tuple[str, str]],
+    names: Sequence[str],
+    workers: int = 0,
+    cache: Optional[LabelCache] = None,
+) -> Iterator[fo.Sample]:
+    """
+    Yield samples for (image filename, label path) entries already sorted by
+    filename, assigning filename_order as they are produced.
+    """
+    for order, fname, records in iter_labeled_entries(label_entries, names, workers, cache):
+        sample = build_sample(os.path.join(img_dir, fname), fname, records)
+        sample["filename_order"] = order
+        yield sample
+
+
+def ingest_samples(
+    dataset: fo.Dataset,
+    samples: Iterable[fo.Sample],
+    batch_size: int,
+    timings: Optional[dict] = None,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Insert samples into the dataset in fixed-size batches so only one batch
+    is held in memory at a time. Returns the number of inserted samples.
 
     Args:
-        labels_limit: Number of labels to compare (0 = all labels).
+        timings: Optional dict whose "insert_seconds" accumulates the time
+            spent in add_samples (the rest is parsing and sample building).
+        on_batch: Optional callback called with the running total of
+            inserted samples after every batch.
+    """
+    batch_size = max(1, batch_size)
+    inserted = 0
+    insert_seconds = 0.0
+    batch = []
+    for sample in samples:
+        batch.append(sample)
+        if len(batch) >= batch_size:
+            insert_start = time.perf_counter()
+            dataset.add_samples(batch)
+            insert_seconds += time.perf_counter() - insert_start
+            inserted += len(batch)
+            batch = []
+            print(f"Inserted {inserted} samples")
+            if on_batch is not None:
+                on_batch(inserted)
+
+    if batch:
+        insert_start = time.perf_counter()
+        dataset.add_samples(batch)
+        insert_seconds += time.perf_counter() - insert_start
+        inserted += len(batch)
+        if on_batch is not None:
+            on_batch(inserted)
+
+    if timings is not None:
+        timings["insert_seconds"] = timings.get("insert_seconds", 0.0) + insert_seconds
+    return inserted
+
+
+def build_sample_doc(
+    dataset_id: ObjectId,
+    img_path: str,
+    fname: str,
+    order: int,
+    records: Sequence[LabelRecord],
+) -> dict:
+    """
+    Build the MongoDB document of a sample through FiftyOne's own
+    serialization (the sample build_sample makes for add_samples), then
+    fill in what add_samples sets on insert: the id, dataset id and
+    creation times.
+    """
+    sample = build_sample(img_path, fname, records)
+    sample["filename_order"] = order
+    doc = sample.to_mongo_dict(include_id=True)
+    if doc.get("_id") is None:
+        doc["_id"] = ObjectId()
+    now = datetime.now(timezone.utc)
+    doc["_dataset_id"] = dataset_id
+    doc["created_at"] = now
+    doc["last_modified_at"] = now
+    return doc
+
+
+def bulk_insert_samples(
+    dataset: fo.Dataset,
+    mongodb_uri: str,
+    img_dir: str,
+    label_entries: Sequence[Tuple[str, str]],
+    names: Sequence[str],
+    workers: int = 0,
+    batch_size: int = 1000,
+    cache: Optional[LabelCache] = None,
+    timings: Optional[dict] = None,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> int:
     """
-    # Apply labels limit if specified
-    if labels_limit > 0:
-        labels1 = labels1[:labels_limit]
-        labels2 = labels2[:labels_limit]
+    Fast path for initial dataset creation: write sample documents (see
+    build_sample_doc) straight into the dataset's sample collection with
+    unordered insert_many batches, bypassing add_samples. Returns the number
+    of inserted samples.
+    timings and on_batch behave as in ingest_samples.
+    """
+    batch_size = max(1, batch_size)
+    dataset.media_type = "image"
 
-    if len(labels1) != len(labels2):
-        return False
+    client = MongoClient(mongodb_uri)
+    try:
+        collection = client[fo.config.database_name][dataset._sample_collection_name]
+        dataset_id = dataset._doc.id
+
+        inserted = 0
+        insert_seconds = 0.0
+        batch = []
+        for order, fname, records in iter_labeled_entries(label_entries, names, workers, cache):
+            img_path = os.path.join(img_dir, fname)
+            batch.append(build_sample_doc(dataset_id, img_path, fname, order, records))
+            if len(batch) >= batch_size:
+                insert_start = time.perf_counter()
+                collection.insert_many(batch, ordered=False)
+                insert_seconds += time.perf_counter() - insert_start
+                inserted += len(batch)
+                batch = []
+                print(f"Inserted {inserted} samples")
+                if on_batch is not None:
+                    on_batch(inserted)
+
+        if batch:
+            insert_start = time.perf_counter()
+            collection.insert_many(batch, ordered=False)
+            insert_seconds += time.perf_counter() - insert_start
+            inserted += len(batch)
+            if on_batch is not None:
+                on_batch(inserted)
+    finally:
+        client.close()
 
-    if len(labels1) == 0:
-        return False
+    if timings is not None:
+        timings["insert_seconds"] = timings.get("insert_seconds", 0.0) + insert_seconds
 
-    # Check all classes match (sorted)
-    classes1 = sorted([label[0] for label in labels1])
-    classes2 = sorted([label[0] for label in labels2])
-    if classes1 != classes2:
-        return False
+    # Let FiftyOne pick up the documents written behind its back
+    dataset.reload()
+    return inserted
 
-    # Group boxes by class ID
-    groups1 = defaultdict(list)
-    groups2 = defaultdict(list)
 
-    for label in labels1:
-        class_id = label[0]
-        box = label[1:]  # (x, y, w, h)
-        groups1[class_id].append(box)
+# ----------------------------------------------------------------------
+# Persistent mode: manifest-based incremental reconciliation
+# ----------------------------------------------------------------------
 
-    for label in labels2:
-        class_id = label[0]
-        box = label[1:]  # (x, y, w, h)
-        groups2[class_id].append(box)
+MANIFEST_VERSION = 1
 
-    # For each class, find optimal matching using greedy algorithm
-    for class_id in groups1.keys():
-        boxes1 = groups1[class_id]
-        boxes2 = groups2[class_id]
 
-        # Use greedy matching: repeatedly find best IoU pair
-        used2 = set()
+def write_json_atomic(path: str, data: dict, indent: Optional[int] = None) -> None:
+    """Write JSON through a temporary file so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
 
-        for box1 in boxes1:
-            best_iou = -1
-            best_idx = -1
 
-            # Find best matching box2 for this box1
-            for idx, box2 in enumerate(boxes2):
-                if idx in used2:
-                    continue
-                iou = calculate_iou(box1, box2)
-                if iou > best_iou:
-                    best_iou = iou
-                    best_idx = idx
+def reset_database(mongodb_uri: str, db_name: str) -> None:
+    """Drop the MongoDB database and FiftyOne dataset named db_name."""
+    # Delete existing database to ensure clean start
+    try:
+        client = MongoClient(mongodb_uri)
+        if db_name in client.list_database_names():
+            print(f"Dropping existing database: {db_name}")
+            client.drop_database(db_name)
+        client.close()
+    except Exception as e:
+        print(f"Warning: Could not drop existing database: {e}")
 
-            # Check if best match meets threshold
-            if best_iou < iou_threshold:
-                return False
+    # Delete any existing FiftyOne dataset with the same name
+    try:
+        if db_name in fo.list_datasets():
+            print(f"Deleting existing FiftyOne dataset: {db_name}")
+            fo.delete_dataset(db_name)
+    except Exception as e:
+        print(f"Warning: Could not delete existing dataset: {e}")
 
-            used2.add(best_idx)
 
-    return True
+def get_manifest_path(dataset_base: str, db_name: str) -> str:
+    return os.path.join(dataset_base, f".fiftyone_manifest_{db_name}.json")
 
 
-def find_duplicate_groups(
-    image_paths: Sequence[str],
-    iou_threshold: float,
-    dataset_path: str = "",
-    labels_limit: int = 0,
-) -> List[List[int]]:
+def stat_label_entries(
+    img_dir: str,
+    label_entries: Sequence[Tuple[str, str]],
+) -> Dict[str, List[int]]:
+    """Return {image filename: [image size, image mtime_ns, label size, label mtime_ns]}."""
+    stats = {}
+    for fname, txt_path in label_entries:
+        img_stat = os.stat(os.path.join(img_dir, fname))
+        label_stat = os.stat(txt_path)
+        stats[fname] = [
+            img_stat.st_size,
+            img_stat.st_mtime_ns,
+            label_stat.st_size,
+            label_stat.st_mtime_ns,
+        ]
+    return stats
+
+
+def load_manifest(path: str, db_name: str, names: Sequence[str]) -> Optional[dict]:
+    """
+    Load the manifest written by a previous persistent start.
+    Returns None when it is missing, unreadable or was built with other settings.
     """
-    Find duplicate groups using sequential comparison based on filename order.
-    Only uses label comparison (class + bounding box IoU).
+    if not os.path.exists(path):
+        return None
 
-    Args:
-        labels_limit: Number of labels to compare (0 = all labels).
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read manifest {path}: {e}")
+        return None
+
+    if (
+        manifest.get("version") != MANIFEST_VERSION
+        or manifest.get("dataset") != db_name
+        or manifest.get("class_names") != list(names)
+        or not isinstance(manifest.get("entries"), dict)
+    ):
+        print("Manifest does not match current settings; rebuilding dataset")
+        return None
+
+    return manifest
+
+
+def save_manifest(
+    path: str,
+    db_name: str,
+    names: Sequence[str],
+    entry_stats: Dict[str, List[int]],
+) -> None:
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "dataset": db_name,
+        "class_names": list(names),
+        "entries": entry_stats,
+    }
+    write_json_atomic(path, manifest)
+
+
+def delete_samples_for_files(dataset: fo.Dataset, img_dir: str, filenames: Sequence[str]) -> None:
+    paths = [os.path.join(img_dir, fname) for fname in filenames]
+    dataset.delete_samples(dataset.match(F("filepath").is_in(paths)))
+
+
+def assign_filename_order(
+    dataset: fo.Dataset, img_dir: str, label_entries: Sequence[Tuple[str, str]]
+) -> None:
+    """Renumber filename_order so it follows label_entries without gaps."""
+    orders = {
+        os.path.join(img_dir, fname): order
+        for order, (fname, _txt_path) in enumerate(label_entries)
+    }
+    dataset.set_values("filename_order", orders, key_field="filepath")
+
+
+def reconcile_dataset(
+    dataset: fo.Dataset,
+    img_dir: str,
+    label_entries: Sequence[Tuple[str, str]],
+    entry_stats: Dict[str, List[int]],
+    manifest_entries: Dict[str, List[int]],
+    names: Sequence[str],
+    workers: int = 0,
+    batch_size: int = 1000,
+    cache: Optional[LabelCache] = None,
+) -> int:
     """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    n = len(image_paths)
+    Bring an existing dataset in line with the directory by adding, deleting
+    or updating only the samples whose image or label changed since the
+    manifest was written. Returns the number of samples touched.
+    """
+    added = [entry for entry in label_entries if entry[0] not in manifest_entries]
+    changed = [
+        entry
+        for entry in label_entries
+        if entry[0] in manifest_entries and manifest_entries[entry[0]] != entry_stats[entry[0]]
+    ]
+    removed = [fname for fname in manifest_entries if fname not in entry_stats]
 
-    if labels_limit > 0:
-        print(f"Labels limit: comparing only first {labels_limit} labels for duplicate detection")
+    print(
+        f"Reconciling dataset: {len(added)} added, {len(changed)} changed, "
+        f"{len(removed)} removed, "
+        f"{len(label_entries) - len(added) - len(changed)} unchanged"
+    )
 
-    print(f"Finding duplicates in {n} images using IoU threshold {iou_threshold}")
+    if removed:
+        delete_samples_for_files(dataset, img_dir, removed)
 
-    groups: List[List[int]] = []
-    visited = [False] * n
+    batch_size = max(1, batch_size)
+    for i in range(0, len(changed), batch_size):
+        values = {
+            os.path.join(img_dir, fname): build_polylines(records)
+            for _order, fname, records in iter_labeled_entries(
+                changed[i:i + batch_size], names, workers, cache
+            )
+        }
+        dataset.set_values("ground_truth", values, key_field="filepath")
 
-    with open(f"similar_path_{timestamp}.txt", 'w', encoding="utf-8") as f:
-        i = 0
-        while i < n:
-            if visited[i]:
-                i += 1
-                continue
+    if added:
+        ingest_samples(dataset, iter_samples(img_dir, added, names, workers, cache), batch_size)
 
-            # Start a new group with current file
-            current_group = [i]
-            visited[i] = True
-            base_labels = parse_yolo_labels(image_paths[i])
+    if added or removed:
+        assign_filename_order(dataset, img_dir, label_entries)
 
-            # Skip if no labels
-            if not base_labels:
-                i += 1
-                continue
+    return len(added) + len(changed) + len(removed)
 
-            # Compare with subsequent files
-            j = i + 1
-            while j < n:
-                if visited[j]:
-                    j += 1
-                    continue
 
-                # Parse labels for comparison file
-                compare_labels = parse_yolo_labels(image_paths[j])
+# ----------------------------------------------------------------------
+# Startup instrumentation
+# ----------------------------------------------------------------------
 
-                # Check if labels are similar (same classes + IoU >= threshold)
-                if labels_are_similar(base_labels, compare_labels, iou_threshold, labels_limit):
-                    current_group.append(j)
-                    visited[j] = True
-                    f.write(f"Similar labels (IoU >= {iou_threshold})\n")
-                    f.write(f"  base: {image_paths[i]}\n")
-                    f.write(f"  match: {image_paths[j]}\n")
-                else:
-                    # Found a different file, stop comparing with this base
-                    break
 
-                j += 1
+def _cpu_seconds() -> float:
+    """CPU time of this process plus reaped children (e.g. pool workers)."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
 
-            # Only add groups with more than 1 file
-            if len(current_group) > 1:
-                groups.append(current_group)
 
-            i += 1
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
 
-    return groups
 
+def _current_rss_mb() -> Optional[float]:
+    """Resident memory of this process right now (None where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(resident_pages * resource.getpagesize() / (1024 * 1024), 1)
 
-def get_matching_rule(
-    dataset_path: str,
-    rules: List[dict],
-    default_action: str = "move",
-) -> dict:
+
+class StartupMetrics:
+    """
+    Records wall time, CPU time, items processed and memory for each startup
+    phase and writes them as a JSON report. The report is rewritten after
+    every phase so a crashed start still shows how far it got.
+
+    Memory per phase: resident memory at its start and end, how much the
+    process's peak RSS grew during it (0 when it stayed below an earlier
+    peak), and the running peaks of this process and of its largest child
+    so far.
     """
-    Find the highest priority rule matching the dataset path.
 
-    Args:
-        dataset_path: Path to check against patterns
-        rules: List of rule dicts with pattern, action, labels, priority
-        default_action: Action when no pattern matches
+    def __init__(self, report_path: Optional[str], dataset_base: str, db_name: str):
+        self.report_path = report_path
+        self.dataset_base = dataset_base
+        self.db_name = db_name
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.status = "running"
+        self.phases: List[dict] = []
+        self._start_wall = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[dict]:
+        """
+        Time a startup phase. The yielded dict can be filled with extra
+        values, e.g. record["items"] = number of files processed.
+        """
+        record = {"name": name, "items": None}
+        wall_start = time.perf_counter()
+        cpu_start = _cpu_seconds()
+        rss_start = _current_rss_mb()
+        peak_start = _peak_rss_mb()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = round(time.perf_counter() - wall_start, 4)
+            record["cpu_seconds"] = round(_cpu_seconds() - cpu_start, 4)
+            running_peak = _peak_rss_mb()
+            record["rss_start_mb"] = rss_start
+            record["rss_end_mb"] = _current_rss_mb()
+            record["peak_rss_growth_mb"] = round(running_peak - peak_start, 1)
+            record["running_peak_rss_mb"] = running_peak
+            record["children_running_peak_rss_mb"] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+            self.phases.append(record)
+            self.write()
+
+    def complete(self) -> None:
+        self.status = "complete"
+        self.write()
+
+    def fail(self) -> None:
+        self.status = "failed"
+        self.write()
+
+    def write(self) -> None:
+        if not self.report_path:
+            return
+
+        report = {
+            "dataset_path": self.dataset_base,
+            "dataset_name": self.db_name,
+            "started_at": self.started_at,
+            "status": self.status,
+            "total_wall_seconds": round(time.perf_counter() - self._start_wall, 4),
+            "peak_rss_mb": _peak_rss_mb(),
+            "phases": self.phases,
+        }
+        try:
+            write_json_atomic(self.report_path, report, indent=2)
+        except OSError as e:
+            print(f"Warning: Could not write startup metrics to {self.report_path}: {e}")
 
-    Returns:
-        dict: {action: str, labels: int} - the effective rule
+
+class StartupProgress:
+    """
+    Startup state written as JSON for the manager to poll: the current step,
+    whether the App is already serving the dataset and how many samples have
+    been inserted out of the expected total. Safe to update from any thread.
     """
-    matching_rules = []
-    path_lower = dataset_path.lower()
 
-    for rule in rules:
-        pattern = rule.get("pattern", "")
-        if pattern and pattern.lower() in path_lower:
-            matching_rules.append(rule)
+    def __init__(self, path: Optional[str], db_name: str):
+        self.path = path
+        self.state = {
+            "dataset_name": db_name,
+            "status": "starting",
+            "step": None,
+            "app_ready": False,
+            "samples_total": None,
+            "samples_inserted": 0,
+            "error": None,
+            "updated_at": None,
+        }
+        self._lock = threading.Lock()
+        self.update()
+
+    def update(self, **values) -> None:
+        with self._lock:
+            self.state.update(values)
+            self.state["updated_at"] = datetime.now().isoformat(timespec="seconds")
+            if not self.path:
+                return
+            try:
+                write_json_atomic(self.path, self.state)
+            except OSError as e:
+                print(f"Warning: Could not write startup progress to {self.path}: {e}")
 
-    if not matching_rules:
-        return {"action": default_action, "labels": 0}
 
-    # Sort by priority (lower = higher priority)
-    matching_rules.sort(key=lambda r: r.get("priority", 999))
-    winner = matching_rules[0]
+# ----------------------------------------------------------------------
+# Startup pipeline
+# ----------------------------------------------------------------------
 
-    return {"action": winner.get("action", default_action), "labels": winner.get("labels", 0)}
+# Sort order, sync_label.py lookups, grid filenames and label filters
+DEFAULT_INDEX_FIELDS = ("filename_order", "filepath", "filename", "ground_truth.polylines.label")
 
 
-def process_duplicates(
-    dataset_base: str,
-    groups: List[List[int]],
-    image_paths: List[str],
-    debug: bool,
-    action: str = "move",
-) -> None:
+def create_dataset(db_name: str, persistent: bool = False) -> fo.Dataset:
     """
-    Process duplicate groups based on the specified action.
-
-    Args:
-        action: "move" to move to duplicate/ folder, "delete" to remove directly.
+    Create the empty dataset with the fields ingest fills. Persistent
+    datasets survive FiftyOne's exit cleanup, which otherwise deletes
+    non-persistent datasets when the last connected client exits.
     """
-    if action == "delete":
-        # Delete duplicates directly without moving to duplicate folder
-        for group_idx, group in enumerate(groups, start=1):
-            keep_idx = group[0]
-            files_to_delete = group if debug else group[1:]
+    print(f"Creating new dataset: {db_name}")
+    dataset = fo.Dataset(db_name)
+    if persistent:
+        dataset.persistent = True
 
-            for idx in files_to_delete:
-                src_img = image_paths[idx]
-                stem = os.path.splitext(os.path.basename(src_img))[0]
-                src_label = os.path.join(dataset_base, "labels", stem + ".txt")
+    dataset.add_sample_field("filename", fo.StringField)
+    dataset.add_sample_field("filename_order", fo.IntField)
+    dataset.add_sample_field(
+        "ground_truth", fo.EmbeddedDocumentField, embedded_doc_type=fo.Polylines
+    )
+    return dataset
 
-                # Delete image
-                if os.path.exists(src_img):
-                    os.remove(src_img)
 
-                # Delete label
-                if os.path.exists(src_label):
-                    os.remove(src_label)
+def ensure_indexes(dataset: fo.Dataset, fields: Sequence[str]) -> List[str]:
+    """
+    Create single-field indexes for the fields the App and tools sort, look
+    up or filter on, then check they exist. Existing indexes are left as is.
+    Returns the fields that are indexed.
+    """
+    for field in fields:
+        try:
+            dataset.create_index(field)
+        except Exception as e:
+            print(f"Warning: Could not create index on {field}: {e}")
 
-            if debug:
-                print(f"Deleted all {len(group)} duplicates in group {group_idx}")
-            else:
-                kept = image_paths[keep_idx]
-                print(f"Kept original: {kept}; deleted {len(group) - 1} duplicates")
-    else:
-        # Move duplicates to duplicate/ folder (default behavior)
-        dup_root = os.path.join(dataset_base, "duplicate")
-        dup_img_root = os.path.join(dup_root, "images")
-        dup_label_root = os.path.join(dup_root, "labels")
-        os.makedirs(dup_img_root, exist_ok=True)
-        os.makedirs(dup_label_root, exist_ok=True)
-
-        for group_idx, group in enumerate(groups, start=1):
-            keep_idx = group[0]
-            group_folder_img = dup_img_root
-            group_folder_label = dup_label_root
-            if debug:
-                group_name = f"group_{group_idx:04d}"
-                group_folder_img = os.path.join(dup_img_root, group_name)
-                group_folder_label = os.path.join(dup_label_root, group_name)
-                os.makedirs(group_folder_img, exist_ok=True)
-                os.makedirs(group_folder_label, exist_ok=True)
-
-            # In debug mode, move ALL duplicates (including the first one)
-            # In normal mode, keep the first one and move the rest
-            files_to_move = group if debug else group[1:]
-
-            for idx in files_to_move:
-                src_img = image_paths[idx]
-                stem, ext = os.path.splitext(os.path.basename(src_img))
-                target_img_dir = group_folder_img
-                target_label_dir = group_folder_label
-
-                if debug:
-                    target_img = os.path.join(target_img_dir, os.path.basename(src_img))
-                    target_label = os.path.join(target_label_dir, stem + ".txt")
-                else:
-                    target_img, target_label = unique_target_path(target_img_dir, target_label_dir, os.path.basename(src_img))
-
-                os.makedirs(os.path.dirname(target_img), exist_ok=True)
-                os.makedirs(os.path.dirname(target_label), exist_ok=True)
-                os.rename(src_img, target_img)
-
-                src_label = os.path.join(dataset_base, "labels", stem + ".txt")
-                if os.path.exists(src_label):
-                    os.rename(src_label, target_label)
-                else:
-                    # Leave a marker file so the user knows the label was missing
-                    with open(target_label, "w") as f:
-                        f.write("# Label file was missing for this duplicate\n")
-
-            if debug:
-                print(f"Moved all {len(group)} duplicates to {group_folder_img}")
-            else:
-                kept = image_paths[keep_idx]
-                print(f"Kept original: {kept}; moved {len(group) - 1} duplicates to {dup_root}")
+    existing = set(dataset.list_indexes())
+    indexed = [field for field in fields if field in existing]
+    missing = [field for field in fields if field not in existing]
+    if missing:
+        print(f"Warning: Missing indexes: {', '.join(missing)}")
+    print(f"Indexed fields: {', '.join(indexed) or 'none'}")
+    return indexed
 
 
-def handle_duplicates(
+def run_duplicate_phases(
+    args: argparse.Namespace,
     dataset_base: str,
     iou_threshold: float,
-    debug: bool,
-    duplicate_rules: Optional[List[dict]] = None,
-    default_action: str = "move",
+    duplicate_rules: list,
+    index: DatasetIndex,
+    metrics: StartupMetrics,
 ) -> None:
+    # Run duplicate detection on labels, plus image hashes when --image-hash is set
+    with metrics.phase("handle_duplicates") as record:
+        record["items"] = handle_duplicates(
+            dataset_base,
+            iou_threshold,
+            args.debug,
+            duplicate_rules=duplicate_rules,
+            default_action=args.duplicate_default_action,
+            index=index,
+            engine=args.similarity_engine,
+            search=args.duplicate_search,
+            workers=args.workers,
+            incremental=args.incremental_duplicates,
+            hash_rule=build_hash_rule(args.image_hash, args.hash_rule, args.hash_distance),
+        )
+
+    # Remove any labels orphaned by duplicate handling
+    with metrics.phase("remove_orphaned_labels_after_duplicates") as record:
+        record["items"] = remove_orphaned_labels(dataset_base, index)
+
+
+def prepare_dataset(
+    args: argparse.Namespace,
+    dataset: fo.Dataset,
+    dataset_base: str,
+    db_name: str,
+    mongodb_uri: str,
+    names: Sequence[str],
+    iou_threshold: float,
+    duplicate_rules: list,
+    manifest: Optional[dict],
+    metrics: StartupMetrics,
+    progress: StartupProgress,
+    session: Optional[fo.Session] = None,
+) -> Tuple[DatasetIndex, List[Tuple[str, str]]]:
     """
-    Detect and handle duplicate images based on label similarity (class + IoU).
-    No image hash computation - only label file comparison.
+    Clean up the dataset folder, handle duplicates and fill the dataset.
+    Returns the directory index and the (image filename, label path) entries
+    of the samples in the dataset.
 
     Args:
-        duplicate_rules: List of rules for pattern-based duplicate handling.
-        default_action: Default action when no rule matches (skip, move, delete).
+        manifest: Loaded manifest in persistent mode; the existing dataset is
+            then reconciled instead of ingested from scratch.
+        session: App session that is already serving the dataset (progressive
+            mode). Samples are then ingested before duplicate handling so the
+            first pages show up right away, and samples whose image duplicate
+            handling removed are deleted afterwards.
     """
-    if duplicate_rules is None:
-        duplicate_rules = []
+    ingest_first = session is not None
 
-    # Get matching rule for this dataset path
-    rule = get_matching_rule(dataset_base, duplicate_rules, default_action)
-    action = rule["action"]
-    labels_limit = rule["labels"]
+    # List images/ and labels/ once; later phases query and update this index
+    progress.update(status="preparing", step="cleanup")
+    with metrics.phase("scan_directories") as record:
+        index = DatasetIndex(dataset_base)
+        record["items"] = len(index.images) + len(index.labels)
 
-    print(f"Duplicate handling rule: action={action}, labels={labels_limit}")
+    # Remove label files whose corresponding image no longer exists
+    with metrics.phase("remove_orphaned_labels") as record:
+        record["items"] = remove_orphaned_labels(dataset_base, index)
+
+    if not ingest_first:
+        progress.update(step="duplicates")
+        run_duplicate_phases(args, dataset_base, iou_threshold, duplicate_rules, index, metrics)
+
+    # Collect labeled images from images/ + YOLO labels/
+    img_dir = index.img_dir
+
+    # Sort up front: filename order is assigned while samples are streamed
+    with metrics.phase("scan_labels") as record:
+        label_entries = []
+        for fname in index.image_filenames():
+            stem = os.path.splitext(fname)[0]
+            if not index.has_label(stem):
+                continue
 
-    # Skip duplicate detection if action is "skip"
-    if action == "skip":
-        print("Skipping duplicate detection (action=skip)")
-        return
+            label_entries.append((fname, index.label_path(stem)))
+
+        print(f"Found {len(label_entries)} labeled images")
+
+        entry_stats = stat_label_entries(img_dir, label_entries) if args.persistent else {}
+        record["items"] = len(label_entries)
+
+    label_cache = None if args.no_label_cache else open_label_cache(dataset_base)
+    progress.update(step="ingest", samples_total=len(label_entries))
+
+    if manifest is not None:
+        with metrics.phase("reconcile_dataset") as record:
+            record["items"] = reconcile_dataset(
+                dataset,
+                img_dir,
+                label_entries,
+                entry_stats,
+                manifest["entries"],
+                names,
+                workers=args.workers,
+                batch_size=args.ingest_batch_size,
+                cache=label_cache,
+            )
+        progress.update(samples_inserted=len(label_entries))
+    else:
+        shown = [False]
+
+        def on_batch(inserted: int) -> None:
+            progress.update(samples_inserted=inserted)
+            # Let the open App pick up the first batch
+            if session is not None and not shown[0]:
+                shown[0] = True
+                session.refresh()
+
+        # Stream samples into the dataset in bounded batches
+        with metrics.phase("ingest") as record:
+            ingest_start = time.perf_counter()
+            timings = {}
+            if args.bulk_insert:
+                print("Using raw MongoDB bulk insert for ingest")
+                inserted = bulk_insert_samples(
+                    dataset,
+                    mongodb_uri,
+                    img_dir,
+                    label_entries,
+                    names,
+                    workers=args.workers,
+                    batch_size=args.ingest_batch_size,
+                    cache=label_cache,
+                    timings=timings,
+                    on_batch=on_batch,
+                )
+            else:
+                samples = iter_samples(img_dir, label_entries, names, args.workers, label_cache)
+                inserted = ingest_samples(
+                    dataset, samples, args.ingest_batch_size, timings, on_batch=on_batch
+                )
+            print(f"Collected {inserted} samples")
+
+            # Parsing and insertion are interleaved; split the phase time
+            record["items"] = inserted
+            record["insert_seconds"] = round(timings.get("insert_seconds", 0.0), 4)
+            record["parse_seconds"] = round(
+                time.perf_counter() - ingest_start - timings.get("insert_seconds", 0.0), 4
+            )
+
+    if label_cache is not None:
+        if label_cache.hits or label_cache.misses:
+            print(f"Label cache: {label_cache.hits} hits, {label_cache.misses} misses")
+        label_cache.close()
+
+    if ingest_first:
+        progress.update(step="duplicates")
+        run_duplicate_phases(args, dataset_base, iou_threshold, duplicate_rules, index, metrics)
+
+        # Drop the samples whose image or label duplicate handling removed
+        with metrics.phase("remove_duplicate_samples") as record:
+            kept = [
+                (fname, txt_path)
+                for fname, txt_path in label_entries
+                if fname in index.images and index.has_label(os.path.splitext(fname)[0])
+            ]
+            kept_names = {fname for fname, _txt_path in kept}
+            removed = [fname for fname, _txt_path in label_entries if fname not in kept_names]
+            if removed:
+                delete_samples_for_files(dataset, img_dir, removed)
+                assign_filename_order(dataset, img_dir, kept)
+                entry_stats = {
+                    fname: stats for fname, stats in entry_stats.items() if fname in kept_names
+                }
+            label_entries = kept
+            record["items"] = len(removed)
+
+    if args.persistent:
+        save_manifest(get_manifest_path(dataset_base, db_name), db_name, names, entry_stats)
+
+    progress.update(
+        status="ready",
+        step=None,
+        samples_total=len(label_entries),
+        samples_inserted=len(label_entries),
+    )
+    if session is not None:
+        session.refresh()
+    return index, label_entries
 
-    img_dir = os.path.join(dataset_base, "images")
-    label_dir = os.path.join(dataset_base, "labels")
-    print(f"Image directory: {img_dir}")
-    print(f"Label directory: {label_dir}")
 
-    if not os.path.isdir(img_dir) or not os.path.isdir(label_dir):
-        print("Images or labels directory not found; skipping duplicate detection")
-        return
+# ----------------------------------------------------------------------
+# Live watcher: apply disk changes to the running dataset
+# ----------------------------------------------------------------------
 
-    # Sort image paths to ensure consistent ordering (filename order = time order)
-    image_paths = [
-        os.path.join(img_dir, fname)
-        for fname in sorted(os.listdir(img_dir))
-        if fname.lower().endswith((".jpg", ".jpeg", ".png"))
-    ]
+# Image names a label stem can belong to (the index itself is case-insensitive)
+IMAGE_NAME_EXTENSIONS = IMAGE_EXTENSIONS + tuple(ext.upper() for ext in IMAGE_EXTENSIONS)
 
-    if not image_paths:
-        print("No images found; skipping duplicate detection")
-        return
 
-    print(f"Analyzing {len(image_paths)} images for duplicates using IoU threshold {iou_threshold}")
+def apply_disk_changes(
+    dataset: fo.Dataset,
+    index: DatasetIndex,
+    ingested: Dict[str, str],
+    changes: Iterable[FileChange],
+    rescan: bool,
+    names: Sequence[str],
+    batch_size: int = 1000,
+    cache: Optional[LabelCache] = None,
+) -> Tuple[int, int, int]:
+    """
+    Add, update or delete the samples affected by a batch of file changes.
+    Returns the number of (added, updated, removed) samples.
 
-    # Find duplicate groups based on label similarity only
-    groups = find_duplicate_groups(image_paths, iou_threshold, dataset_base, labels_limit)
+    Args:
+        ingested: Image filename -> label path of the samples in the dataset;
+            updated in place.
+        rescan: Events may have been lost; re-list both folders and re-check
+            every sample (unchanged labels are skipped by the label diff).
+    """
+    img_dir = index.img_dir
+    affected: Set[str] = set()
+    relabeled: Set[str] = set()
+
+    if rescan:
+        index.rescan()
+        affected = set(index.images) | set(ingested)
+        relabeled = {os.path.splitext(fname)[0] for fname in affected}
+
+    for directory, name in changes:
+        stem, ext = os.path.splitext(name)
+        exists = os.path.exists(os.path.join(directory, name))
+        if directory == img_dir:
+            if ext.lower() not in IMAGE_EXTENSIONS:
+                continue
+            if exists:
+                index.images.add(name)
+            else:
+                index.discard_image(name)
+            affected.add(name)
+        elif ext.lower() == ".txt" and not name.startswith("."):
+            if exists:
+                index.labels.add(name)
+            else:
+                index.discard_label(name)
+            relabeled.add(stem)
+            affected.update(
+                stem + image_ext
+                for image_ext in IMAGE_NAME_EXTENSIONS
+                if stem + image_ext in index.images or stem + image_ext in ingested
+            )
+
+    added = []
+    updated = []
+    removed = []
+    for fname in sorted(affected):
+        stem = os.path.splitext(fname)[0]
+        should_exist = fname in index.images and index.has_label(stem)
+        if should_exist and fname not in ingested:
+            added.append((fname, index.label_path(stem)))
+        elif not should_exist and fname in ingested:
+            removed.append(fname)
+        elif should_exist and stem in relabeled:
+            updated.append((os.path.join(img_dir, fname), ingested[fname]))
 
-    if not groups:
-        print("No duplicates found.")
-        return
+    if removed:
+        delete_samples_for_files(dataset, img_dir, removed)
+        for fname in removed:
+            del ingested[fname]
+
+    if updated:
+        # Labels the editor already synced diff as unchanged and are skipped;
+        # a save racing with the editor's own sync is written with absolute
+        # values (see sync_label.write_label_updates), so it cannot duplicate
+        # polylines
+        sync_batch(dataset, updated, names, cache)
+
+    if added:
+        ingest_samples(dataset, iter_samples(img_dir, added, names, cache=cache), batch_size)
+        ingested.update(added)
+        # Removed samples only leave gaps, new ones need a place in the order
+        assign_filename_order(dataset, img_dir, sorted(ingested.items()))
+
+    if added or updated or removed:
+        print(
+            f"Applied disk changes: {len(added)} added, {len(updated)} updated, "
+            f"{len(removed)} removed"
+        )
+    return len(added), len(updated), len(removed)
 
-    process_duplicates(dataset_base, groups, image_paths, debug, action)
-    print(f"Detected {len(groups)} duplicate group(s).")
+
+def watch_dataset(
+    args: argparse.Namespace,
+    dataset: fo.Dataset,
+    dataset_base: str,
+    index: DatasetIndex,
+    label_entries: Sequence[Tuple[str, str]],
+    names: Sequence[str],
+    stop_event: Optional[threading.Event] = None,
+) -> None:
+    """Apply changes in images/ and labels/ to the dataset until stop_event is set."""
+    watcher = open_watcher([index.img_dir, index.label_dir], args.watch_poll_interval)
+    cache = None if args.no_label_cache else open_label_cache(dataset_base)
+    ingested = dict(label_entries)
+    print(f"Watching {index.img_dir} and {index.label_dir} for changes")
+    try:
+        batches = iter_change_batches(watcher, args.watch_settle, stop_event, args.watch_max_batch)
+        for changes, rescan in batches:
+            try:
+                apply_disk_changes(
+                    dataset,
+                    index,
+                    ingested,
+                    changes,
+                    rescan,
+                    names,
+                    batch_size=args.ingest_batch_size,
+                    cache=cache,
+                )
+            except Exception as e:
+                print(f"Warning: Could not apply disk changes: {e}")
+            if cache is not None:
+                cache.flush()
+    finally:
+        watcher.close()
+        if cache is not None:
+            cache.close()
 
 
 # ----------------------------------------------------------------------
@@ -549,6 +1082,127 @@ def parse_args() -> argparse.Namespace:
         choices=["skip", "move", "delete"],
         help="Default action when no pattern matches (default: move).",
     )
+    parser.add_argument(
+        "--similarity-engine",
+        type=str,
+        default="auto",
+        choices=SIMILARITY_ENGINES,
+        help="Label comparator for duplicate detection: numpy (vectorized IoU matrix), "
+        "python (per-pair loop) or auto (numpy for frames with many boxes). All give the same result.",
+    )
+    parser.add_argument(
+        "--duplicate-search",
+        type=str,
+        default="sequential",
+        choices=DUPLICATE_SEARCH_MODES,
+        help="sequential: compare each image with the images right after it in filename order. "
+        "global: find duplicates anywhere in the dataset through a label-signature index.",
+    )
+    parser.add_argument(
+        "--image-hash",
+        type=str,
+        default="none",
+        choices=("none",) + HASH_KINDS,
+        help="Also compare perceptual image hashes during duplicate detection (needs OpenCV; default: none).",
+    )
+    parser.add_argument(
+        "--hash-rule",
+        type=str,
+        default="and",
+        choices=HASH_RULES,
+        help="and: duplicates must match on labels and image hash. or: either is enough (default: and).",
+    )
+    parser.add_argument(
+        "--hash-distance",
+        type=int,
+        default=DEFAULT_MAX_DISTANCE,
+        help=f"Maximum Hamming distance (of 64 bits) for images to match (default: {DEFAULT_MAX_DISTANCE}).",
+    )
+    parser.add_argument(
+        "--incremental-duplicates",
+        action="store_true",
+        help="Only compare images added since the last start for duplicates. Labels edited in "
+        "already scanned images are not compared again (default: compare all images).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Worker processes for label parsing during ingest and for the sequential "
+        "duplicate search and image hashing (default: 0 = single process).",
+    )
+    parser.add_argument(
+        "--ingest-batch-size",
+        type=int,
+        default=1000,
+        help="Number of samples inserted per batch during ingest (default: 1000).",
+    )
+    parser.add_argument(
+        "--bulk-insert",
+        action="store_true",
+        help="Write serialized sample documents directly with pymongo insert_many instead of "
+        "dataset.add_samples.",
+    )
+    parser.add_argument(
+        "--persistent",
+        action="store_true",
+        help="Keep the dataset between starts and only apply changes found via a file manifest.",
+    )
+    parser.add_argument(
+        "--no-label-cache",
+        action="store_true",
+        help="Parse every label file during ingest instead of using the on-disk parsed-label cache.",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        default=None,
+        help="Where to write the per-phase startup timing report "
+        "(default: startup_metrics.json in the dataset folder).",
+    )
+    parser.add_argument(
+        "--indexes",
+        type=str,
+        default=",".join(DEFAULT_INDEX_FIELDS),
+        help="Comma-separated sample fields to index, or 'none' "
+        f"(default: {','.join(DEFAULT_INDEX_FIELDS)}).",
+    )
+    parser.add_argument(
+        "--progressive",
+        action="store_true",
+        help="Launch the App on the empty dataset first and ingest samples in the background.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep watching images/ and labels/ after startup and apply changes to the dataset.",
+    )
+    parser.add_argument(
+        "--watch-settle",
+        type=float,
+        default=1.0,
+        help="Seconds without new file events before a batch of changes is applied (default: 1.0).",
+    )
+    parser.add_argument(
+        "--watch-max-batch",
+        type=float,
+        default=DEFAULT_MAX_BATCH_SECONDS,
+        help="Apply a batch of changes at most this many seconds after its first change, even while "
+        f"file events keep arriving (default: {DEFAULT_MAX_BATCH_SECONDS}).",
+    )
+    parser.add_argument(
+        "--watch-poll-interval",
+        type=float,
+        default=2.0,
+        help="Directory scan interval when inotify is unavailable (default: 2.0).",
+    )
+    parser.add_argument(
+        "--progress-file",
+        type=str,
+        default=None,
+        help="Where to write the startup progress for the manager "
+        "(default: startup_progress.json in the dataset folder).",
+    )
     return parser.parse_args()
 
 
@@ -582,23 +1236,51 @@ def main() -> None:
     print(f"Using MongoDB: {mongodb_uri}")
     print(f"Database name: {db_name}")
 
-    # Delete existing database to ensure clean start
-    try:
-        client = MongoClient(mongodb_uri)
-        if db_name in client.list_database_names():
-            print(f"Dropping existing database: {db_name}")
-            client.drop_database(db_name)
-        client.close()
-    except Exception as e:
-        print(f"Warning: Could not drop existing database: {e}")
+    metrics_path = args.metrics_file or os.path.join(dataset_base, "startup_metrics.json")
+    metrics = StartupMetrics(metrics_path, dataset_base, db_name)
+    progress_path = args.progress_file or os.path.join(dataset_base, "startup_progress.json")
+    progress = StartupProgress(progress_path, db_name)
 
-    # Delete any existing FiftyOne dataset with the same name
-    try:
-        if db_name in fo.list_datasets():
-            print(f"Deleting existing FiftyOne dataset: {db_name}")
-            fo.delete_dataset(db_name)
-    except Exception as e:
-        print(f"Warning: Could not delete existing dataset: {e}")
+    # Load class names from file or use defaults
+    if args.class_file and os.path.exists(args.class_file):
+        print(f"Loading class names from: {args.class_file}")
+        with open(args.class_file, 'r') as f:
+            names = [line.strip() for line in f if line.strip()]
+        print(f"Loaded {len(names)} class names")
+    else:
+        names = ["one", "two", "three", "four", "five", "six", "invalid"]
+        if args.class_file:
+            print(f"Warning: Class file not found: {args.class_file}, using default names")
+
+    # In persistent mode an existing dataset is reconciled instead of rebuilt
+    manifest_path = get_manifest_path(dataset_base, db_name)
+    manifest = None
+    if args.persistent:
+        manifest = load_manifest(manifest_path, db_name, names)
+        if manifest is not None and db_name not in fo.list_datasets():
+            print(f"Dataset {db_name} not found; rebuilding")
+            manifest = None
+        elif manifest is not None:
+            existing = fo.load_dataset(db_name)
+            if not existing.persistent:
+                print(f"Dataset {db_name} is not persistent; rebuilding")
+                manifest = None
+            elif len(existing) != len(manifest["entries"]):
+                print("Dataset does not match manifest; rebuilding")
+                manifest = None
+
+    if manifest is None:
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        with metrics.phase("reset_database"):
+            reset_database(mongodb_uri, db_name)
+    else:
+        print(f"Persistent mode: reusing existing dataset {db_name}")
+
+    if args.indexes.strip().lower() == "none":
+        index_fields = []
+    else:
+        index_fields = [field.strip() for field in args.indexes.split(",") if field.strip()]
 
     # Parse duplicate rules from JSON string
     duplicate_rules = []
@@ -612,120 +1294,87 @@ def main() -> None:
             print(f"Warning: Failed to parse duplicate_rules JSON: {e}")
             duplicate_rules = []
 
-    # Remove label files whose corresponding image no longer exists
-    remove_orphaned_labels(dataset_base)
+    # ------------------------------------------------------------------
+    # 1. Create dataset (MongoDB already configured at start)
+    # ------------------------------------------------------------------
+    if manifest is not None:
+        dataset = fo.load_dataset(db_name)
+    else:
+        dataset = create_dataset(db_name, persistent=args.persistent)
 
-    # Run duplicate detection using label comparison only (no image hashing)
-    handle_duplicates(
+    pipeline_args = (
+        args,
+        dataset,
         dataset_base,
+        db_name,
+        mongodb_uri,
+        names,
         iou_threshold,
-        args.debug,
-        duplicate_rules=duplicate_rules,
-        default_action=args.duplicate_default_action,
+        duplicate_rules,
+        manifest,
+        metrics,
+        progress,
     )
 
-    # Remove any labels orphaned by duplicate handling
-    remove_orphaned_labels(dataset_base)
-
     # ------------------------------------------------------------------
-    # 1. Build your custom dataset from images + YOLO labels
+    # 2. Clean up the folder, handle duplicates and fill the dataset
+    #    (after the App is up in progressive mode)
     # ------------------------------------------------------------------
-    # Load class names from file or use defaults
-    if args.class_file and os.path.exists(args.class_file):
-        print(f"Loading class names from: {args.class_file}")
-        with open(args.class_file, 'r') as f:
-            names = [line.strip() for line in f if line.strip()]
-        print(f"Loaded {len(names)} class names")
-    else:
-        names = ["one", "two", "three", "four", "five", "six", "invalid"]
-        if args.class_file:
-            print(f"Warning: Class file not found: {args.class_file}, using default names")
-
-    img_dir = os.path.join(dataset_base, "images")
-    label_dir = os.path.join(dataset_base, "labels")
-
-    samples = []
-    for fname in os.listdir(img_dir):
-        if not fname.lower().endswith((".jpg", ".jpeg", ".png")):
-            continue
-
-        img_path = os.path.join(img_dir, fname)
-        txt_path = os.path.join(label_dir, os.path.splitext(fname)[0] + ".txt")
-
-        if not os.path.exists(txt_path):
-            continue
-
-        polylines = []
-        with open(txt_path, "r") as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) < 5:
-                    continue
-
-                cls_idx = int(float(parts[0]))
-                # Handle class indices beyond the hardcoded names list
-                if cls_idx < len(names):
-                    label = names[cls_idx]
-                else:
-                    label = f"class_{cls_idx}"
-                if len(parts) >= 9:
-                    coords = list(map(float, parts[1:9]))
-                    points = [(coords[i], coords[i + 1]) for i in range(0, 8, 2)]
-                    points = order_points_clockwise_from_top_left(points)
-                else:
-                    x, y, w, h = map(float, parts[1:5])
-                    points = [
-                        (x - w / 2, y - h / 2),
-                        (x + w / 2, y - h / 2),
-                        (x + w / 2, y + h / 2),
-                        (x - w / 2, y + h / 2),
-                    ]
-
-                polylines.append(
-                    fo.Polyline(
-                        label=label,
-                        points=[points],
-                        closed=True,
-                        filled=False,
-                    )
-                )
-
-        sample = fo.Sample(filepath=img_path)
-        sample["filename"] = fname
-        sample["ground_truth"] = fo.Polylines(polylines=polylines)
-        samples.append(sample)
+    if not args.progressive:
+        try:
+            index, label_entries = prepare_dataset(*pipeline_args)
+        except Exception as e:
+            progress.update(status="failed", error=str(e))
+            metrics.fail()
+            raise
 
-    print(f"Collected {len(samples)} samples")
+    # Indexes are built after ingest, or on the empty dataset before a
+    # progressive start so the App sorts on an index from the first batch
+    with metrics.phase("create_indexes") as record:
+        record["items"] = len(ensure_indexes(dataset, index_fields))
 
-    # ------------------------------------------------------------------
-    # 2. Add a numeric field that encodes filename order (for sorting)
-    # ------------------------------------------------------------------
-    sorted_by_name = sorted(samples, key=lambda s: s["filename"])
-    for idx, sample in enumerate(sorted_by_name):
-        sample["filename_order"] = idx
+    with metrics.phase("app_config_save"):
+        dataset.app_config.sort_by = "filename_order"
+        dataset.save()
 
     # ------------------------------------------------------------------
-    # 3. Create dataset (MongoDB already configured at start)
+    # 3. Launch FiftyOne App
     # ------------------------------------------------------------------
-    print(f"Creating new dataset: {db_name}")
-    dataset = fo.Dataset(db_name)
-
-    dataset.add_sample_field("filename", fo.StringField)
-    dataset.add_sample_field("filename_order", fo.IntField)
-    dataset.add_sample_field(
-        "ground_truth", fo.EmbeddedDocumentField, embedded_doc_type=fo.Polylines
-    )
-
-    dataset.add_samples(samples)
+    with metrics.phase("launch_app"):
+        view = dataset.sort_by("filename_order")
+        session = fo.launch_app(view, port=fiftyone_port, address="0.0.0.0", remote=True)
+    progress.update(app_ready=True)
+
+    if args.progressive:
+        # The App is already up; fill the dataset from a background thread
+        def run_pipeline() -> None:
+            try:
+                index, label_entries = prepare_dataset(*pipeline_args, session=session)
+            except Exception as e:
+                traceback.print_exc()
+                progress.update(status="failed", error=str(e))
+                metrics.fail()
+                return
+            metrics.complete()
+            print(f"Startup metrics written to {metrics_path}")
+
+            if args.watch:
+                watch_dataset(args, dataset, dataset_base, index, label_entries, names)
+
+        threading.Thread(target=run_pipeline, name="progressive-startup", daemon=True).start()
+        session.wait(-1)
+        return
 
-    dataset.app_config.sort_by = "filename_order"
-    dataset.save()
+    metrics.complete()
+    print(f"Startup metrics written to {metrics_path}")
 
-    # ------------------------------------------------------------------
-    # 4. Launch FiftyOne App
-    # ------------------------------------------------------------------
-    view = dataset.sort_by("filename_order")
-    session = fo.launch_app(view, port=fiftyone_port, address="0.0.0.0", remote=True)
+    if args.watch:
+        threading.Thread(
+            target=watch_dataset,
+            args=(args, dataset, dataset_base, index, label_entries, names),
+            name="dataset-watcher",
+            daemon=True,
+        ).start()
     session.wait(-1)
 
 
@@ -1,35 +1,23 @@
 import argparse
-import math
+import json
 import os
+import socket
+import socketserver
+import sys
+import tempfile
+import time
 
 import fiftyone as fo
 from fiftyone import ViewField as F
 
+from label_cache import get_label_rows, open_label_cache
+from label_geometry import rows_to_polygons
 
-def order_points_clockwise_from_top_left(points):
-    cx = sum(p[0] for p in points) / len(points)
-    cy = sum(p[1] for p in points) / len(points)
-
-    with_angle = []
-    for x, y in points:
-        with_angle.append((x, y, math.atan2(y - cy, x - cx)))
-
-    with_angle.sort(key=lambda p: p[2], reverse=True)
-
-    start_index = 0
-    for i in range(1, len(with_angle)):
-        if (with_angle[i][1] < with_angle[start_index][1]) or (
-            with_angle[i][1] == with_angle[start_index][1]
-            and with_angle[i][0] < with_angle[start_index][0]
-        ):
-            start_index = i
-
-    ordered = []
-    for i in range(len(with_angle)):
-        idx = (start_index + i) % len(with_angle)
-        ordered.append((with_angle[idx][0], with_angle[idx][1]))
-
-    return ordered
+SOCKET_DIR = os.environ.get("LABEL_SYNC_SOCKET_DIR") or tempfile.gettempdir()
+DEFAULT_IDLE_TIMEOUT = 600
+DEFAULT_DEBOUNCE_MS = 500
+# Samples updated per set_values call in --batch mode
+BATCH_CHUNK_SIZE = 1000
 
 
 def load_class_names(class_file):
@@ -41,58 +29,566 @@ def load_class_names(class_file):
     return ["one", "two", "three", "four", "five", "six", "invalid"]
 
 
-def parse_label_file(label_path, class_names):
+def open_cache_for_label(label_path):
+    # Labels live in <dataset>/labels/, the cache sits in <dataset>/
+    label_dir = os.path.dirname(os.path.abspath(label_path))
+    if os.path.basename(label_dir) != "labels":
+        return None
+    return open_label_cache(os.path.dirname(label_dir))
+
+
+def parse_label_file(label_path, class_names, cache=None):
     polylines = []
     if not label_path or not os.path.exists(label_path):
         return polylines
 
-    with open(label_path, "r", encoding="utf-8") as f:
-        for line in f:
-            parts = line.strip().split()
-            if len(parts) < 5:
-                continue
-
-            cls_idx = int(float(parts[0]))
-            label = class_names[cls_idx] if cls_idx < len(class_names) else f"class_{cls_idx}"
-
-            if len(parts) >= 9:
-                coords = list(map(float, parts[1:9]))
-                points = [(coords[i], coords[i + 1]) for i in range(0, 8, 2)]
-                points = order_points_clockwise_from_top_left(points)
-            else:
-                x, y, w, h = map(float, parts[1:5])
-                points = [
-                    (x - w / 2, y - h / 2),
-                    (x + w / 2, y - h / 2),
-                    (x + w / 2, y + h / 2),
-                    (x - w / 2, y + h / 2),
-                ]
-
-            polylines.append(
-                fo.Polyline(label=label, points=[points], closed=True, filled=False)
-            )
+    rows = get_label_rows(label_path, cache)
+    for row, points in zip(rows, rows_to_polygons(rows)):
+        cls_idx = int(row[0])
+        label = class_names[cls_idx] if cls_idx < len(class_names) else f"class_{cls_idx}"
+
+        polylines.append(
+            fo.Polyline(label=label, points=[points], closed=True, filled=False)
+        )
 
     return polylines
 
 
+class SampleNotFoundError(RuntimeError):
+    pass
+
+
+class LookupStats:
+    # Latency of filepath -> sample lookups, reported by the server and CLI
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def as_dict(self):
+        return {
+            "lookups": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+lookup_stats = LookupStats()
+
+
+def load_dataset(dataset_name):
+    dataset = fo.load_dataset(dataset_name)
+    # Lookups below rely on this index (FiftyOne normally creates it already)
+    dataset.create_index("filepath")
+    return dataset
+
+
+def find_sample(dataset, image_path):
+    # dataset[filepath] is a find_one on the filepath index, so the cost does
+    # not grow with the dataset like a match() aggregation can
+    start = time.perf_counter()
+    try:
+        sample = dataset[image_path]
+    except KeyError:
+        sample = None
+    lookup_stats.record((time.perf_counter() - start) * 1000)
+    return sample
+
+
+# Samples whose ground_truth was left as is, updated label by label, or rewritten
+write_stats = {"unchanged": 0, "updated": 0, "rewritten": 0}
+
+
+def polyline_key(polyline):
+    points = tuple(tuple(point) for shape in polyline.points for point in shape)
+    return polyline.label, points
+
+
+def polyline_bounds(polyline):
+    points = [point for shape in polyline.points for point in shape]
+    if not points:
+        return 0.0, 0.0, 0.0, 0.0
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def bounds_iou(bounds1, bounds2):
+    width = min(bounds1[2], bounds2[2]) - max(bounds1[0], bounds2[0])
+    height = min(bounds1[3], bounds2[3]) - max(bounds1[1], bounds2[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    area1 = (bounds1[2] - bounds1[0]) * (bounds1[3] - bounds1[1])
+    area2 = (bounds2[2] - bounds2[0]) * (bounds2[3] - bounds2[1])
+    return intersection / (area1 + area2 - intersection)
+
+
+def pair_leftovers(leftover, unmatched):
+    # Pair edited polylines with the stored ones they came from: same label
+    # and overlapping bounds, best IoU first, then same points under a new
+    # label (a class change). Each stored polyline is used once; polylines
+    # left unpaired count as removed or added.
+    # Returns [(stored index, parsed index)] into leftover and unmatched.
+    parsed_bounds = [polyline_bounds(polyline) for polyline in unmatched]
+    candidates = []
+    for i, stored in enumerate(leftover):
+        bounds = polyline_bounds(stored)
+        stored_points = polyline_key(stored)[1]
+        for j, parsed in enumerate(unmatched):
+            if parsed.label == stored.label:
+                iou = bounds_iou(bounds, parsed_bounds[j])
+                if iou > 0:
+                    candidates.append((0, -iou, i, j))
+            elif polyline_key(parsed)[1] == stored_points:
+                candidates.append((1, -1.0, i, j))
+
+    pairs = []
+    used_stored = set()
+    used_parsed = set()
+    for _relabel, _iou, i, j in sorted(candidates):
+        if i in used_stored or j in used_parsed:
+            continue
+        used_stored.add(i)
+        used_parsed.add(j)
+        pairs.append((i, j))
+    return pairs
+
+
+def diff_polylines(stored, parsed):
+    # Match the polylines parsed from the label file to the stored ones so
+    # unchanged and edited polylines keep their ids. Exact matches are taken
+    # first, the remaining parsed polylines are paired with the remaining
+    # stored ones by pair_leftovers and copied onto them.
+    # Returns (polylines, modified, added, removed): the new list in file
+    # order, reusing stored objects, the stored polylines that were edited,
+    # and how many polylines were added and removed.
+    available = {}
+    for polyline in stored:
+        available.setdefault(polyline_key(polyline), []).append(polyline)
+
+    polylines = []
+    unmatched = []
+    for i, polyline in enumerate(parsed):
+        candidates = available.get(polyline_key(polyline))
+        if candidates:
+            polylines.append(candidates.pop(0))
+        else:
+            polylines.append(polyline)
+            unmatched.append(i)
+
+    matched = {id(polyline) for polyline in polylines}
+    leftover = [polyline for polyline in stored if id(polyline) not in matched]
+
+    modified = []
+    for i, j in pair_leftovers(leftover, [parsed[k] for k in unmatched]):
+        polyline = leftover[i]
+        polyline.label = parsed[unmatched[j]].label
+        polyline.points = parsed[unmatched[j]].points
+        polylines[unmatched[j]] = polyline
+        modified.append(polyline)
+
+    added = len(unmatched) - len(modified)
+    removed = len(leftover) - len(modified)
+    return polylines, modified, added, removed
+
+
+def write_label_updates(dataset, changes):
+    # changes maps sample id -> (stored polylines or None, parsed polylines).
+    # Samples whose polylines were only edited get per-label updates; samples
+    # with added or removed polylines (or no ground_truth yet) get the whole
+    # list set in file order, keeping the ids of matched polylines. Both
+    # writes are absolute, so applying the same label file twice (e.g. from
+    # the sync server and the dataset watcher, or a retried request) leaves
+    # one copy of every polyline. Samples that already match are skipped.
+    points = {}
+    labels = {}
+    rewrites = {}
+    for sample_id, (stored, parsed) in changes.items():
+        if stored is None:
+            rewrites[sample_id] = fo.Polylines(polylines=parsed)
+            write_stats["rewritten"] += 1
+            continue
+
+        polylines, modified, added, removed = diff_polylines(stored, parsed)
+        if added or removed:
+            rewrites[sample_id] = fo.Polylines(polylines=polylines)
+            write_stats["rewritten"] += 1
+        elif modified:
+            for polyline in modified:
+                points[polyline.id] = polyline.points
+                labels[polyline.id] = polyline.label
+            write_stats["updated"] += 1
+        else:
+            write_stats["unchanged"] += 1
+
+    if points:
+        dataset.set_label_values("ground_truth.polylines.points", points)
+        dataset.set_label_values("ground_truth.polylines.label", labels)
+    if rewrites:
+        dataset.set_values("ground_truth", rewrites, key_field="id")
+
+
+def stored_polylines(ground_truth):
+    return list(ground_truth.polylines) if ground_truth is not None else None
+
+
+def sync_sample(dataset, image_path, label_path, class_names, cache=None):
+    polylines = parse_label_file(label_path, class_names, cache)
+
+    sample = find_sample(dataset, image_path)
+    if sample is None:
+        raise SampleNotFoundError(f"Sample not found for filepath: {image_path}")
+
+    stored = stored_polylines(sample["ground_truth"])
+    write_label_updates(dataset, {sample.id: (stored, polylines)})
+
+
+def read_batch_pairs(stream):
+    # One {"image_path": ..., "label_path": ...} object per line
+    pairs = []
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            pairs.append((item["image_path"], item["label_path"]))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Warning: Skipping invalid batch line {line_number}: {e}")
+    return pairs
+
+
+def sync_batch(dataset, pairs, class_names, cache=None, chunk_size=BATCH_CHUNK_SIZE):
+    # Returns the image paths that have no sample in the dataset
+    missing = []
+    for i in range(0, len(pairs), chunk_size):
+        chunk = pairs[i:i + chunk_size]
+        labels = {
+            image_path: parse_label_file(label_path, class_names, cache)
+            for image_path, label_path in chunk
+        }
+
+        start = time.perf_counter()
+        view = dataset.match(F("filepath").is_in(list(labels)))
+        filepaths, sample_ids, ground_truths = view.values(["filepath", "id", "ground_truth"])
+        lookup_stats.record((time.perf_counter() - start) * 1000)
+
+        stored = {
+            filepath: (sample_id, stored_polylines(ground_truth))
+            for filepath, sample_id, ground_truth in zip(filepaths, sample_ids, ground_truths)
+        }
+        changes = {
+            stored[image_path][0]: (stored[image_path][1], polylines)
+            for image_path, polylines in labels.items()
+            if image_path in stored
+        }
+        missing.extend(image_path for image_path in labels if image_path not in stored)
+
+        if changes:
+            write_label_updates(dataset, changes)
+    return missing
+
+
+def default_socket_path(dataset_name):
+    return os.path.join(SOCKET_DIR, f"fiftyone_label_sync_{dataset_name}.sock")
+
+
+class SyncQueue:
+    # Pending sync requests keyed by (dataset, image path). A new save of the
+    # same image replaces the pending request, so only the latest label file
+    # content is applied once the image has been quiet for the debounce window.
+
+    def __init__(self, debounce_seconds):
+        self.debounce_seconds = debounce_seconds
+        self.pending = {}
+        self.coalesced = 0
+
+    def push(self, request):
+        key = (request["dataset_name"], request["image_path"])
+        if self.pending.pop(key, None) is not None:
+            self.coalesced += 1
+        # Re-inserting keeps the dict ordered by last save time
+        self.pending[key] = (request, time.monotonic())
+
+    def pop_due(self, flush_all=False):
+        now = time.monotonic()
+        due = []
+        for key, (request, saved_at) in list(self.pending.items()):
+            if not flush_all and now - saved_at < self.debounce_seconds:
+                break
+            due.append(request)
+            del self.pending[key]
+        return due
+
+    def seconds_until_due(self):
+        if not self.pending:
+            return None
+        _request, saved_at = next(iter(self.pending.values()))
+        return max(0.0, saved_at + self.debounce_seconds - time.monotonic())
+
+
+class SyncServer:
+    # Keeps fiftyone imported, datasets loaded and label caches open between
+    # requests. Requests are handled one at a time, in arrival order, and
+    # applied in batches once their debounce window has passed.
+
+    def __init__(self, debounce_seconds=0.0):
+        self.datasets = {}
+        self.caches = {}
+        self.queue = SyncQueue(debounce_seconds)
+        self.last_request = time.monotonic()
+        self.received = 0
+        self.flushes = 0
+
+    def get_dataset(self, dataset_name, reload=False):
+        if reload or dataset_name not in self.datasets:
+            self.datasets[dataset_name] = load_dataset(dataset_name)
+        return self.datasets[dataset_name]
+
+    def get_cache(self, label_path):
+        dataset_dir = os.path.dirname(os.path.dirname(os.path.abspath(label_path)))
+        if dataset_dir not in self.caches:
+            self.caches[dataset_dir] = open_cache_for_label(label_path)
+        return self.caches[dataset_dir]
+
+    def stats(self):
+        return {
+            "lookup": lookup_stats.as_dict(),
+            "writes": dict(write_stats),
+            "queue": {
+                "received": self.received,
+                "coalesced": self.queue.coalesced,
+                "pending": len(self.queue.pending),
+                "flushes": self.flushes,
+            },
+        }
+
+    def handle(self, request):
+        if request.get("command") == "stats":
+            return self.stats()
+
+        for key in ("dataset_name", "image_path", "label_path"):
+            if not request.get(key):
+                raise ValueError(f"Missing {key}")
+        self.last_request = time.monotonic()
+        self.received += 1
+
+        if self.queue.debounce_seconds <= 0:
+            missing = self.apply([request])
+            if missing:
+                raise SampleNotFoundError(f"Sample not found for filepath: {missing[0]}")
+            return {}
+
+        self.queue.push(request)
+        return {"queued": True}
+
+    def apply(self, requests):
+        # Returns the image paths that have no sample in their dataset
+        groups = {}
+        for request in requests:
+            key = (request["dataset_name"], request.get("class_file", ""))
+            groups.setdefault(key, []).append((request["image_path"], request["label_path"]))
+
+        missing = []
+        for (dataset_name, class_file), pairs in groups.items():
+            class_names = load_class_names(class_file)
+            cache = self.get_cache(pairs[0][1])
+            not_found = sync_batch(self.get_dataset(dataset_name), pairs, class_names, cache)
+            if not_found:
+                # The instance may have been restarted, which recreates the dataset
+                not_found = set(not_found)
+                retry = [pair for pair in pairs if pair[0] in not_found]
+                dataset = self.get_dataset(dataset_name, reload=True)
+                not_found = sync_batch(dataset, retry, class_names, cache)
+            missing.extend(not_found)
+        self.flushes += 1
+        return missing
+
+    def flush(self, flush_all=False):
+        due = self.queue.pop_due(flush_all)
+        if not due:
+            return
+        try:
+            missing = self.apply(due)
+        except Exception as e:
+            print(f"Label sync failed for {len(due)} labels: {e}")
+            return
+        for image_path in missing:
+            print(f"Sample not found for filepath: {image_path}")
+
+    def close(self):
+        self.flush(flush_all=True)
+        for cache in self.caches.values():
+            if cache is not None:
+                cache.close()
+        self.caches = {}
+
+
+class SyncRequestHandler(socketserver.StreamRequestHandler):
+    # One JSON request per line, answered with one JSON line:
+    # {"ok": true, "elapsed_ms": ...} or {"ok": false, "error": "..."}.
+    # Debounced requests are answered with "queued": true before they are
+    # applied. {"command": "stats"} returns lookup, write and queue counters.
+
+    # Requests are served one at a time; drop clients that stay silent
+    timeout = 30
+
+    def handle(self):
+        try:
+            for line in self.rfile:
+                self.handle_line(line)
+        except socket.timeout:
+            pass
+
+    def handle_line(self, line):
+        if not line.strip():
+            return
+
+        start = time.perf_counter()
+        try:
+            response = {"ok": True, **self.server.sync_server.handle(json.loads(line))}
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        response["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+def serve(socket_path, idle_timeout, debounce_seconds=0.0):
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            print(f"Label sync server already running on {socket_path}")
+            return
+        except OSError:
+            # Left over from a server that did not shut down cleanly
+            os.remove(socket_path)
+        finally:
+            probe.close()
+
+    server = socketserver.UnixStreamServer(socket_path, SyncRequestHandler)
+    sync_server = server.sync_server = SyncServer(debounce_seconds)
+    print(f"Label sync server listening on {socket_path}")
+    try:
+        while True:
+            sync_server.flush()
+
+            # Wake up for the next debounced flush or the idle deadline
+            wait = sync_server.queue.seconds_until_due()
+            if idle_timeout > 0:
+                idle_left = sync_server.last_request + idle_timeout - time.monotonic()
+                if idle_left <= 0 and wait is None:
+                    print(f"Label sync server idle for {idle_timeout}s, exiting")
+                    break
+                wait = idle_left if wait is None else min(wait, idle_left)
+
+            server.timeout = wait
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        sync_server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def sync_batch_file(dataset_name, batch_path, class_file):
+    if batch_path == "-":
+        pairs = read_batch_pairs(sys.stdin)
+    else:
+        with open(batch_path, "r", encoding="utf-8") as f:
+            pairs = read_batch_pairs(f)
+
+    # A batch comes from one dataset folder, whose cache serves every pair
+    cache = open_cache_for_label(pairs[0][1]) if pairs else None
+    class_names = load_class_names(class_file)
+    dataset = load_dataset(dataset_name)
+    try:
+        missing = sync_batch(dataset, pairs, class_names, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    for image_path in missing[:10]:
+        print(f"Sample not found for filepath: {image_path}")
+    print(f"Synced {len(pairs) - len(missing)} labels, {len(missing)} samples not found")
+    print(f"Sample lookups: {lookup_stats.as_dict()}")
+    print(f"Sample writes: {write_stats}")
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--dataset-name", required=True)
-    parser.add_argument("--image-path", required=True)
-    parser.add_argument("--label-path", required=True)
+    parser.add_argument("--image-path")
+    parser.add_argument("--label-path")
     parser.add_argument("--class-file", default="")
+    parser.add_argument(
+        "--batch",
+        nargs="?",
+        const="-",
+        default=None,
+        help="Sync many labels from a JSONL file (or stdin when no file is given) of "
+        "{\"image_path\": ..., \"label_path\": ...} lines",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a long-lived server answering sync requests on a Unix socket",
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="Unix socket path for --serve (default: fiftyone_label_sync_<dataset>.sock in the temp dir)",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=DEFAULT_IDLE_TIMEOUT,
+        help=f"Seconds without requests before --serve exits, 0 to never exit (default: {DEFAULT_IDLE_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--debounce-ms",
+        type=int,
+        default=DEFAULT_DEBOUNCE_MS,
+        help="--serve only: wait this long after the last save of an image before syncing it, "
+        f"0 to sync every request immediately (default: {DEFAULT_DEBOUNCE_MS})",
+    )
     args = parser.parse_args()
 
-    class_names = load_class_names(args.class_file)
-    polylines = parse_label_file(args.label_path, class_names)
+    if args.serve:
+        serve(
+            args.socket or default_socket_path(args.dataset_name),
+            args.idle_timeout,
+            max(0, args.debounce_ms) / 1000,
+        )
+        return
 
-    dataset = fo.load_dataset(args.dataset_name)
-    sample = dataset.match(F("filepath") == args.image_path).first()
-    if sample is None:
-        raise RuntimeError(f"Sample not found for filepath: {args.image_path}")
+    if args.batch is not None:
+        sync_batch_file(args.dataset_name, args.batch, args.class_file)
+        return
+
+    if not args.image_path or not args.label_path:
+        parser.error("--image-path and --label-path are required unless --batch or --serve is given")
 
-    sample["ground_truth"] = fo.Polylines(polylines=polylines)
-    sample.save()
+    class_names = load_class_names(args.class_file)
+    dataset = load_dataset(args.dataset_name)
+    cache = open_cache_for_label(args.label_path)
+    try:
+        sync_sample(dataset, args.image_path, args.label_path, class_names, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    print(f"Sample lookups: {lookup_stats.as_dict()}")
+    print(f"Sample writes: {write_stats}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Check that the chunked parallel duplicate search returns exactly the groups
+of the sequential search, including runs that cross chunk boundaries.
+
+Run with: python test_duplicate_chunks.py (or pytest test_duplicate_chunks.py)
+"""
+
+import os
+import random
+import tempfile
+
+from duplicate_finder import find_duplicate_groups, find_duplicate_groups_parallel
+
+
+def make_dataset(root: str, count: int, seed: int) -> list:
+    """Write count images with labels made of runs of near-identical frames."""
+    rng = random.Random(seed)
+    img_dir = os.path.join(root, "images")
+    label_dir = os.path.join(root, "labels")
+    os.makedirs(img_dir)
+    os.makedirs(label_dir)
+
+    image_paths = []
+    boxes = []
+    for i in range(count):
+        roll = rng.random()
+        if not boxes or roll < 0.3:
+            # New scene
+            boxes = [
+                (rng.randint(0, 2), rng.uniform(0.2, 0.8), rng.uniform(0.2, 0.8), 0.1, 0.1)
+                for _ in range(rng.randint(1, 4))
+            ]
+        elif roll < 0.4:
+            # Drift far enough to end a run against its base, but not the previous frame
+            boxes = [(c, x + 0.012, y, w, h) for c, x, y, w, h in boxes]
+
+        name = f"{i:06d}"
+        image_path = os.path.join(img_dir, name + ".jpg")
+        open(image_path, "w").close()
+        if rng.random() < 0.05:
+            # Unlabeled frame
+            image_paths.append(image_path)
+            continue
+        with open(os.path.join(label_dir, name + ".txt"), "w", encoding="utf-8") as f:
+            for c, x, y, w, h in boxes:
+                f.write(f"{c} {x + rng.gauss(0, 0.001):.6f} {y:.6f} {w} {h}\n")
+        image_paths.append(image_path)
+
+    return image_paths
+
+
+def test_parallel_groups_match_sequential():
+    with tempfile.TemporaryDirectory() as root:
+        image_paths = make_dataset(root, 3000, seed=7)
+        expected = find_duplicate_groups(image_paths, 0.8, root)
+        assert expected, "dataset should contain duplicates"
+
+        for chunk_size in (1, 2, 7, 100, 999, 3000):
+            actual = find_duplicate_groups_parallel(
+                image_paths, 0.8, root, workers=3, chunk_size=chunk_size
+            )
+            assert actual == expected, f"groups differ with chunk_size={chunk_size}"
+
+
+def test_long_run_spanning_many_chunks():
+    with tempfile.TemporaryDirectory() as root:
+        img_dir = os.path.join(root, "images")
+        label_dir = os.path.join(root, "labels")
+        os.makedirs(img_dir)
+        os.makedirs(label_dir)
+        image_paths = []
+        for i in range(500):
+            name = f"{i:06d}"
+            image_paths.append(os.path.join(img_dir, name + ".jpg"))
+            open(image_paths[-1], "w").close()
+            with open(os.path.join(label_dir, name + ".txt"), "w", encoding="utf-8") as f:
+                f.write("0 0.5 0.5 0.2 0.2\n" if i < 450 else f"1 0.{i % 9 + 1} 0.5 0.05 0.05\n")
+
+        expected = find_duplicate_groups(image_paths, 0.8, root)
+        actual = find_duplicate_groups_parallel(image_paths, 0.8, root, workers=4, chunk_size=40)
+        assert actual == expected
+
+
+if __name__ == "__main__":
+    test_parallel_groups_match_sequential()
+    test_long_run_spanning_many_chunks()
+    print("Parallel duplicate groups match the sequential scan")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Check that the NumPy label comparator gives the same answer as the Python
+one on random label pairs: shuffled and jittered copies, tied IoUs from
+repeated boxes, labels_limit truncation and class or count mismatches.
+Also checks the plain-Python OBB comparison used for small frames against
+the batched NumPy one.
+
+Run with: python test_similarity_engines.py (or pytest test_similarity_engines.py)
+"""
+
+import math
+import random
+
+import duplicate_finder
+from duplicate_finder import labels_are_similar, labels_are_similar_auto, labels_are_similar_numpy
+
+THRESHOLDS = (0.3, 0.5, 0.8, 0.95)
+
+
+def random_boxes(rng: random.Random, count: int, classes: int) -> list:
+    return [
+        (rng.randrange(classes), rng.uniform(0.1, 0.9), rng.uniform(0.1, 0.9),
+         rng.uniform(0.02, 0.3), rng.uniform(0.02, 0.3))
+        for _ in range(count)
+    ]
+
+
+def jitter(rng: random.Random, boxes: list, scale: float) -> list:
+    return [
+        (c, x + rng.gauss(0, scale * w), y + rng.gauss(0, scale * h),
+         w * (1 + rng.gauss(0, scale)), h * (1 + rng.gauss(0, scale)))
+        for c, x, y, w, h in boxes
+    ]
+
+
+def make_pair(rng: random.Random) -> tuple:
+    """A label set and a variant of it, with one of the edits the engines must agree on."""
+    labels1 = random_boxes(rng, rng.randint(1, 12), rng.randint(1, 3))
+    labels2 = jitter(rng, labels1, rng.choice((0.0, 0.01, 0.05, 0.2)))
+
+    edit = rng.randrange(5)
+    if edit == 1:
+        # Ties: repeated boxes on one or both sides
+        repeats = [rng.choice(labels1) for _ in range(rng.randint(1, 3))]
+        labels1 = labels1 + repeats
+        labels2 = labels2 + (repeats if rng.random() < 0.5 else jitter(rng, repeats, 0.01))
+    elif edit == 2:
+        # Class mismatch
+        i = rng.randrange(len(labels2))
+        labels2[i] = (labels2[i][0] + 1,) + labels2[i][1:]
+    elif edit == 3:
+        # Count mismatch, or extra labels that only labels_limit hides
+        labels2 = labels2 + random_boxes(rng, rng.randint(1, 3), 3)
+    elif edit == 4:
+        # Unrelated boxes of the same classes
+        labels2 = [(c,) + random_boxes(rng, 1, 1)[0][1:] for c, *_ in labels1]
+
+    rng.shuffle(labels2)
+    return labels1, labels2
+
+
+def test_numpy_matches_python():
+    rng = random.Random(17)
+    outcomes = set()
+    for _ in range(4000):
+        labels1, labels2 = make_pair(rng)
+        threshold = rng.choice(THRESHOLDS)
+        labels_limit = rng.choice((0, 0, 1, 3, len(labels1)))
+
+        expected = labels_are_similar(labels1, labels2, threshold, labels_limit)
+        for similar in (labels_are_similar_numpy, labels_are_similar_auto):
+            actual = similar(labels1, labels2, threshold, labels_limit)
+            assert actual == expected, (
+                f"{similar.__name__} returned {actual} for threshold={threshold}, "
+                f"labels_limit={labels_limit}: {labels1} vs {labels2}"
+            )
+        outcomes.add(expected)
+
+    assert outcomes == {True, False}, "pairs should include both matches and mismatches"
+
+
+def test_tied_boxes_take_first_unused_match():
+    # Two identical boxes of labels1 compete for the same best box of labels2
+    box = (0, 0.5, 0.5, 0.2, 0.2)
+    near = (0, 0.51, 0.5, 0.2, 0.2)
+    far = (0, 0.6, 0.5, 0.2, 0.2)
+    for labels1, labels2 in (([box, box], [near, far]), ([box, box], [far, near]), ([box, near], [box, box])):
+        for threshold in (0.5, 0.8, 0.9):
+            expected = labels_are_similar(labels1, labels2, threshold)
+            assert labels_are_similar_numpy(labels1, labels2, threshold) == expected
+
+
+def random_obb(rng: random.Random, class_id: int) -> tuple:
+    """A rotated rectangle label, with its corners sometimes out of order."""
+    cx, cy = rng.uniform(0.1, 0.9), rng.uniform(0.1, 0.9)
+    w, h, angle = rng.uniform(0.02, 0.3), rng.uniform(0.02, 0.3), rng.uniform(0, math.pi)
+    cos, sin = math.cos(angle), math.sin(angle)
+    corners = [
+        (cx + cos * dx - sin * dy, cy + sin * dx + cos * dy)
+        for dx, dy in ((-w / 2, -h / 2), (w / 2, -h / 2), (w / 2, h / 2), (-w / 2, h / 2))
+    ]
+    if rng.random() < 0.2:
+        rng.shuffle(corners)
+    return (class_id,) + tuple(value for corner in corners for value in corner)
+
+
+def test_obb_scalar_matches_batched():
+    rng = random.Random(24)
+    outcomes = set()
+    for _ in range(3000):
+        labels1 = [random_obb(rng, rng.randrange(3)) for _ in range(rng.randint(1, 10))]
+        labels1 += random_boxes(rng, rng.randint(0, 2), 3)
+        scale = rng.choice((0.0, 0.002, 0.01, 0.05))
+        labels2 = [(label[0],) + tuple(value + rng.gauss(0, scale) for value in label[1:]) for label in labels1]
+        if rng.random() < 0.3:
+            # Ties: a repeated label on both sides
+            labels1.append(rng.choice(labels1))
+            labels2.append(labels1[-1])
+        rng.shuffle(labels2)
+        threshold = rng.choice(THRESHOLDS)
+        labels_limit = rng.choice((0, 0, 2))
+
+        expected = duplicate_finder.labels_are_similar_obb(labels1, labels2, threshold, labels_limit)
+        saved = duplicate_finder.OBB_SCALAR_MAX_LABELS
+        duplicate_finder.OBB_SCALAR_MAX_LABELS = 0
+        try:
+            batched = duplicate_finder.labels_are_similar_obb(labels1, labels2, threshold, labels_limit)
+        finally:
+            duplicate_finder.OBB_SCALAR_MAX_LABELS = saved
+        assert batched == expected, f"threshold={threshold}: {labels1} vs {labels2}"
+        outcomes.add(expected)
+
+    assert outcomes == {True, False}, "pairs should include both matches and mismatches"
+
+
+if __name__ == "__main__":
+    test_numpy_matches_python()
+    test_tied_boxes_take_first_unused_match()
+    test_obb_scalar_matches_batched()
+    print("NumPy and Python label comparators agree, for boxes and OBB")